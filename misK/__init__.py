@@ -0,0 +1,8 @@
+from misK._lazy import lazy_exports
+
+__all__ = ["distributions", "misc", "params", "parse", "plots", "printing", "rl", "utils", "BColors"]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    **{name: name for name in __all__[:-1]},
+    "BColors": "utils",
+})
@@ -0,0 +1,32 @@
+import importlib
+import sys
+
+
+def lazy_exports(package, exports):
+    """
+        Builds the __getattr__ and __dir__ of a package (PEP 562), so that the submodule defining an exported name is
+        only imported when the name is first accessed, and the optional heavy dependencies of the other submodules are
+        never imported.
+
+        Args:
+            package (str): the name of the package, i.e. its __name__.
+            exports (dict): the submodule defining each exported name, relative to the package. A name mapped to
+                itself is the submodule.
+
+        Return:
+            (tuple) the __getattr__ and __dir__ functions of the package.
+    """
+
+    def __getattr__(name):
+        if name not in exports:
+            raise AttributeError(f"module '{package}' has no attribute '{name}'")
+        module = importlib.import_module(f"{package}.{exports[name]}")
+        value = module if exports[name] == name else getattr(module, name)
+        # the next accesses are plain module attribute lookups.
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
@@ -0,0 +1,5 @@
+from misK._lazy import lazy_exports
+
+__all__ = ["ProbabilityDistributionLogger", "load_probas", "probas_dtype"]
+
+__getattr__, __dir__ = lazy_exports(__name__, {name: "log" for name in __all__})
@@ -1,12 +1,43 @@
+import json
 import os
+import time
 
+import numpy as np
 from numpy import round as np_round
 
-from torch.nn.functional import softmax as tnnf_softmax
+
+def probas_dtype(n_envs, n_actions):
+    """
+        The type of the records written by ProbabilityDistributionLogger in 'batched' mode, one per step.
+    """
+    return np.dtype([("step", np.int64), ("episode", np.int64), ("probas", np.float32, (n_envs, n_actions))])
+
+
+def load_probas(path):
+    """
+        Loads the binary file written by ProbabilityDistributionLogger in 'batched' mode.
+
+        Args:
+        -----
+        path : str
+            the path of the file, i.e. the 'save_probas' of the logger.
+
+        Returns:
+        --------
+        records : numpy.ndarray
+            the records of the steps, with 'step', 'episode' and 'probas' fields, the last one of shape
+            (n_envs, n_actions).
+        actions : list of str
+            the names of the actions.
+    """
+    with open(path + ".meta", 'r') as meta:
+        meta = json.load(meta)
+    return np.fromfile(path, dtype=probas_dtype(meta["n_envs"], len(meta["actions"]))), meta["actions"]
 
 
 class ProbabilityDistributionLogger:
-    def __init__(self, actions, trials, save_probas=None, show_probas=False, column_width=10, log=print):
+    def __init__(self, actions, trials, save_probas=None, show_probas=False, column_width=10, batched=False,
+                 flush_every=256, render_every=0.5, log=print):
         """
             ProbabilityDistributionLogger constructor.
 
@@ -22,6 +53,14 @@ class ProbabilityDistributionLogger:
                 tells whether to print the probability distributions of the agent in the terminal.
             column_width : int, optional
                 the width of the columns used in 'show_probas' mode.
+            batched : bool, optional
+                logs the distributions of all the environments, accumulated on the device of the agent and written
+                every 'flush_every' steps. The file is a CSV one if 'save_probas' ends with '.csv', and otherwise a
+                binary file of records described by a JSON '.meta' file next to it, see load_probas.
+            flush_every : int, optional
+                the number of steps accumulated before writing them in 'batched' mode.
+            render_every : float, optional
+                the minimum number of seconds between two terminal lines in 'batched' mode.
             log : function, optional
                 the log function to print strings. Defaults to built-in print.
 
@@ -30,13 +69,21 @@ class ProbabilityDistributionLogger:
             self : ProbabilityDistributionLogger
                 a new instance of the ProbabilityDistributionLogger class.
         """
+        # torch is only imported once a logger is built, not by the modules importing this one.
+        from torch.nn.functional import softmax as tnnf_softmax
+        self.softmax = tnnf_softmax
+        self.actions = actions
         self.save_probas = save_probas
         self.show_probas = show_probas
+        self.batched = batched
+        self.flush_every = flush_every
+        self.render_every = render_every
+        self.buffer, self.steps, self.n_buffered, self.last_render = None, None, 0, 0.
         self.file, self.labels, self.terminal_format, self.file_format, self.col_widths = None, None, None, None, []
         labels = []
 
         if self.save_probas:
-            self.file = open(self.save_probas, 'w')
+            self.file = open(self.save_probas, 'wb' if self.batched and not self._is_csv() else 'w')
 
         if self.save_probas or self.show_probas:
             self.file_col_widths = [max(4, len(str(500 * trials))), max(2, len(str(trials)))]
@@ -60,7 +107,10 @@ class ProbabilityDistributionLogger:
             print(self.terminal_format.format(*labels))
             print(self.terminal_format.replace('|', '+').format(*([''] * len(self.terminal_col_widths))).replace(' ',
                                                                                                                  '-'))
-        if self.save_probas:
+        if self.save_probas and self.batched:
+            if self._is_csv():
+                self.file.write(','.join(["step", "ep", "env"] + actions) + '\n')
+        elif self.save_probas:
             self.file.write(self.file_format.format(*labels) + '\n')
             self.file.write(
                 self.file_format.replace('|', '+').format(*([''] * len(self.file_col_widths))).replace(' ', '-') + '\n')
@@ -88,8 +138,11 @@ class ProbabilityDistributionLogger:
                 the probability distribution over the action space of the agent given the observation.
         """
         probas = None
-        if self.show_probas or self.save_probas:
-            probas = tnnf_softmax(agent.categorize(obs).logits, dim=1)[0].tolist()
+        if self.batched and (self.show_probas or self.save_probas):
+            probas = self.softmax(agent.categorize(obs).logits.detach(), dim=1)
+            self._log_batch(probas, frame, episode)
+        elif self.show_probas or self.save_probas:
+            probas = self.softmax(agent.categorize(obs).logits, dim=1)[0].tolist()
             term_bars = [frame, episode] + ['.' * np_round(proba * col_width).astype(int) for proba, col_width in
                                             zip(probas, self.terminal_col_widths[2:])]
             file_bars = [frame, episode] + ['.' * np_round(proba * col_width).astype(int) for proba, col_width in
@@ -101,6 +154,61 @@ class ProbabilityDistributionLogger:
 
         return probas
 
+    def _is_csv(self):
+        return bool(self.save_probas) and self.save_probas.endswith(".csv")
+
+    def _log_batch(self, probas, frame, episode):
+        """
+            Copies the distributions of all the environments into the preallocated buffer, without leaving the
+            device, and writes the buffer once full. The terminal line, which needs the values on the host, is
+            only printed every 'render_every' seconds.
+        """
+        if self.buffer is None:
+            self.buffer = probas.new_empty((self.flush_every,) + tuple(probas.shape))
+            self.steps = np.zeros((self.flush_every, 2), dtype=np.int64)
+        self.buffer[self.n_buffered].copy_(probas)
+        self.steps[self.n_buffered] = frame, episode
+        self.n_buffered += 1
+        if self.n_buffered == self.flush_every:
+            self.flush()
+
+        if self.show_probas and time.monotonic() - self.last_render >= self.render_every:
+            self.last_render = time.monotonic()
+            term_bars = [frame, episode] + ['.' * np_round(proba * col_width).astype(int) for proba, col_width in
+                                            zip(probas[0].tolist(), self.terminal_col_widths[2:])]
+            print(self.terminal_format.format(*term_bars))
+
+    def flush(self):
+        """
+            Writes the distributions accumulated in 'batched' mode, with a single copy from the device.
+
+            Returns
+            -------
+            None
+        """
+        if not self.n_buffered:
+            return
+        probas = self.buffer[:self.n_buffered].float().cpu().numpy()
+        steps = self.steps[:self.n_buffered]
+        self.n_buffered = 0
+        if not self.save_probas:
+            return
+
+        n_steps, n_envs, n_actions = probas.shape
+        if self._is_csv():
+            rows = np.concatenate([np.repeat(steps, n_envs, axis=0).astype(np.float64),
+                                   np.tile(np.arange(n_envs), n_steps)[:, None],
+                                   probas.reshape(n_steps * n_envs, n_actions)], axis=1)
+            np.savetxt(self.file, rows, delimiter=',', fmt=['%d'] * 3 + ['%.6f'] * n_actions)
+        else:
+            records = np.zeros(n_steps, dtype=probas_dtype(n_envs, n_actions))
+            records["step"], records["episode"], records["probas"] = steps[:, 0], steps[:, 1], probas
+            if self.file.tell() == 0:
+                with open(self.save_probas + ".meta", 'w') as meta:
+                    meta.write(json.dumps({"n_envs": n_envs, "actions": self.actions}))
+            records.tofile(self.file)
+        self.file.flush()
+
     def close(self, agent, log=print):
         """
             Closes the logger, namely its file.
@@ -117,6 +225,8 @@ class ProbabilityDistributionLogger:
             None
         """
 
+        if self.batched:
+            self.flush()
         if self.save_probas:
             self.file.close()
             log(f"probability distributions of {agent.__class__.__name__} stored in {self.save_probas}")
\ No newline at end of file
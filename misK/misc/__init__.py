@@ -0,0 +1,5 @@
+from misK._lazy import lazy_exports
+
+__all__ = ["ProgressBar", "ProgressManager", "ManagedBar"]
+
+__getattr__, __dir__ = lazy_exports(__name__, {name: "progress" for name in __all__})
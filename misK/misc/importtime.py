@@ -0,0 +1,57 @@
+import argparse
+import subprocess
+import sys
+
+# the modules imported by the scripts and the workers, whose import time is tracked.
+ENTRY_POINTS = [
+    "misK",
+    "misK.printing.logger",
+    "misK.params.utils",
+    "misK.misc.progress",
+    "misK.distributions.log",
+    "misK.rl.procgen.wrappers.base",
+    "misK.rl.procgen.wrappers.subproc",
+    "misK.rl.procgen.wrappers.transformations",
+    "misK.rl.procgen.wrappers.recording",
+]
+
+
+def import_time(module, top=5):
+    """
+        Measures the import of a module in a fresh interpreter, with 'python -X importtime'.
+
+        Args:
+            module (str): the module to import.
+            top (int): the number of heaviest modules to report.
+
+        Return:
+            (tuple) the cumulative import time of the module in microseconds, or None if the import failed, and the
+                (microseconds, name) of the 'top' modules taking the longest to import by themselves.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True)
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split('|')
+        imports.append((int(self_us), int(cumulative_us), name.strip()))
+    total = sum(self_us for self_us, _, _ in imports) if process.returncode == 0 else None
+    return total, sorted([(self_us, name) for self_us, _, name in imports], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the import time of the entry points of misK.")
+    parser.add_argument("modules", nargs='*', default=ENTRY_POINTS, help="the modules to measure.")
+    parser.add_argument("--top", type=int, default=5, help="the number of heaviest imports to show per module.")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        total, heaviest = import_time(module, top=args.top)
+        print(f"{module:<45} | " + ("import failed" if total is None else f"{total / 1000:>8.1f} ms"))
+        for self_us, name in heaviest:
+            print(f"{'':<45} |   {self_us / 1000:>6.1f} ms {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
+import multiprocessing as mp
+import sys
+import threading
 import time
-import os
+import weakref
+from collections import deque
+
+from misK.printing.dictionary import terminal_width
 
 
 #
@@ -19,11 +25,53 @@ import os
 #     print('\r', frame, sep='', end='', flush=True)
 #     sleep(0.2)
 
+class _Monitor(threading.Thread):
+    """
+    A daemon thread making the bars whose redraw is due read the clock on their next update. Without it, a loop
+    slowing down after a fast phase would keep the large stride of the fast phase, and its bar would not be redrawn
+    before as many slow updates.
+    """
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.bars = weakref.WeakSet()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            for bar in list(self.bars):
+                if now >= bar.next_draw:
+                    bar.check_at = 0
+
+
+_MONITOR = None
+
+
+def _monitor(bar):
+    global _MONITOR
+    if _MONITOR is None:
+        _MONITOR = _Monitor()
+        _MONITOR.start()
+    _MONITOR.bars.add(bar)
+
+
 class ProgressBar:
-    def __init__(self, total, width=100, desc=''):
+    """
+    A progress bar redrawn at most every 'refresh' seconds. The clock is only read every few updates, as many as the
+    loop runs in a fraction of 'refresh', so that most of the updates only cost an increment and a comparison. Once
+    a redraw is due, a monitor thread makes the next update read the clock anyway, so that a loop slowing down is
+    still redrawn in time.
+    The speed is estimated over the last 'window' redraws, kept in a ring buffer, and the width of the terminal is
+    only read again when it is resized.
+    """
+
+    def __init__(self, total, width=100, desc='', refresh=0.1, window=10):
         self.total = total
         self.progress = 0
         self.width = width
+        self.refresh = refresh
         self.formats = ["{}",
                         "{:5.1f}%",
                         "{:" + str(len(str(self.total))) + "d}/{}",
@@ -31,7 +79,11 @@ class ProgressBar:
 
         self.desc = desc if desc == '' else desc + ':'
         self.start = time.time()
-        self.times = {}
+        self.next_draw = 0.
+        self.stride, self.check_at, self.last_check = 1, 0, None
+        self.times = deque([(0, 0.)], maxlen=window)  # the (progress, time) of the last redraws.
+        terminal_width()  # read from the constructing thread, usually the main one, to watch the resizes.
+        _monitor(self)
 
     def _inner_bar(self, progress, width):
         done = int(progress * width / 100)
@@ -41,32 +93,36 @@ class ProgressBar:
 
     def _bar(self, progress):
         t = time.time() - self.start
-        self.times[self.progress] = t
-        pred = int(t * self.total / self.progress - t)
+        self.times.append((self.progress, t))
+        pred = int(t * self.total / self.progress - t) if self.progress > 0 else 0
         t = int(t)
-        speed = list(self.times.values())[-10:]
-        speed = (speed[-1] - speed[0]) / len(speed)
+        (first, t_first), (last, t_last) = self.times[0], self.times[-1]
+        speed = (last - first) / (t_last - t_first) if t_last > t_first else 0.
         speed, it = (speed, "its/s") if speed >= 1 else (1 / speed, "s/it") if speed > 0 else (float("nan"), "----")
-        deco_width = len(
-            ' '.join([self.formats[0], self.formats[1],
-                      self.formats[2], self.formats[3]]).format(self.desc, progress, self.progress, self.total,
-                                                                t // 60, t % 60, pred // 60, pred % 60, speed, it))
-        terminal_width, _ = os.get_terminal_size()
-        width = min(self.width, terminal_width - deco_width - 3)
-        bar_format = ' '.join([self.formats[0], self.formats[1],
-                               self._inner_bar(progress, width),
-                               self.formats[2], self.formats[3]])
-
-        return bar_format.format(self.desc, progress, self.progress, self.total,
-                                 t // 60, t % 60, pred // 60, pred % 60,
-                                 speed, it)
+        head = self.formats[0].format(self.desc) + ' ' + self.formats[1].format(progress)
+        tail = self.formats[2].format(self.progress, self.total) + ' ' + \
+            self.formats[3].format(t // 60, t % 60, pred // 60, pred % 60, speed, it)
+        width = max(1, min(self.width, terminal_width() - len(head) - len(tail) - 6))
+
+        return head + ' ' + self._inner_bar(progress, width) + ' ' + tail
 
     def __call__(self, incr=1, force=None):
         if force is None:
             self.progress += incr
         else:
             self.progress = force
-        print('\r', self._bar(progress=100 * (self.progress - 1) / self.total), sep='', end='')
+        if self.progress < self.check_at:
+            return
+        # the clock is only read every 'stride' updates, the stride following the speed of the loop.
+        now = time.monotonic()
+        if self.last_check is not None and now > self.last_check[1]:
+            per_second = (self.progress - self.last_check[0]) / (now - self.last_check[1])
+            self.stride = max(1, int(per_second * self.refresh / 4))
+        self.last_check = (self.progress, now)
+        self.check_at = self.progress + self.stride
+        if now >= self.next_draw:
+            self.next_draw = now + self.refresh
+            print('\r', self._bar(progress=100 * (self.progress - 1) / self.total), sep='', end='', flush=True)
 
     def set_description(self, desc):
         self.desc = desc if desc == '' else desc + ':'
@@ -75,6 +131,140 @@ class ProgressBar:
         print('\r', self._bar(progress=100), sep='')
 
 
+class ManagedBar:
+    """
+    The handle of a bar of a ProgressManager, to be updated from a single thread or process. It only holds shared
+    counters, so that it can be given to worker processes when they are started, e.g. as an argument of
+    multiprocessing.Process or through the initializer of a SubprocVecEnv, and an update is a mere write into shared
+    memory.
+    """
+
+    def __init__(self, counts, totals, resets, index):
+        self.counts = counts
+        self.totals = totals
+        self.resets = resets
+        self.index = index
+
+    def __call__(self, incr=1, force=None):
+        if force is None:
+            self.counts[self.index] += incr
+        else:
+            self.counts[self.index] = force
+
+    def reset(self, total=None):
+        """
+            Restarts the bar from 0, e.g. for each epoch of a nested loop, optionally with a new total.
+        """
+        if total is not None:
+            self.totals[self.index] = total
+        self.counts[self.index] = 0
+        self.resets[self.index] += 1
+
+
+class ProgressManager:
+    """
+    Draws several progress bars together, one per line, e.g. one per worker process or one per level of nested loops.
+    The bars are updated through their ManagedBar handles, which only write into shared counters, while a single
+    renderer thread reads them and redraws all the lines in place every 'refresh' seconds.
+    """
+
+    def __init__(self, refresh=0.1, capacity=64, window=10, stream=None):
+        """
+            Constructs a ProgressManager instance, and starts its renderer thread.
+
+            Args:
+                refresh (float): the number of seconds between two redraws.
+                capacity (int): the maximum number of bars.
+                window (int): the number of redraws the speed of a bar is estimated over.
+                stream (file): where to draw the bars. Defaults to sys.stdout.
+
+            Return:
+                (ProgressManager) the constructed object.
+        """
+        self.refresh = refresh
+        self.window = window
+        self.stream = sys.stdout if stream is None else stream
+        self.counts = mp.RawArray('q', capacity)
+        self.totals = mp.RawArray('q', capacity)
+        self.resets = mp.RawArray('q', capacity)
+        self.bars = []  # the ProgressBar formatting each line, with its indentation and the last reset it has seen.
+        self.lock = threading.Lock()
+        self.drawn = 0  # the number of lines drawn by the last redraw.
+
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def add(self, total, desc='', width=100, parent=None):
+        """
+            Adds a bar, drawn below the existing ones.
+
+            Args:
+                total (int): the number of steps of the bar.
+                desc (str): the description of the bar.
+                width (int): the maximum width of the bar itself.
+                parent (ManagedBar): the bar of the outer loop, if any, under which the new one is indented.
+
+            Return:
+                (ManagedBar) the handle to update the bar with.
+        """
+        with self.lock:
+            index = len(self.bars)
+            if index == len(self.counts):
+                raise ValueError(f"cannot add more than {len(self.counts)} bars")
+            self.totals[index] = total
+            depth = 0 if parent is None else self.bars[parent.index][1] + 1
+            bar = ProgressBar(total, width=width, desc=desc, window=self.window)
+            self.bars.append([bar, depth, 0])
+        return ManagedBar(self.counts, self.totals, self.resets, index)
+
+    def _line(self, i):
+        bar, depth, seen = self.bars[i]
+        if self.resets[i] != seen:
+            bar = ProgressBar(self.totals[i], width=bar.width, desc=bar.desc[:-1], window=self.window)
+            self.bars[i] = [bar, depth, self.resets[i]]
+        bar.total, bar.progress = max(self.totals[i], 1), self.counts[i]
+        return '  ' * depth + bar._bar(progress=min(100 * bar.progress / bar.total, 100))
+
+    def _draw(self):
+        with self.lock:
+            lines = [self._line(i) for i in range(len(self.bars))]
+        # the cursor goes back to the first line drawn, and each line is cleared before being redrawn.
+        up = f"\x1b[{self.drawn}F" if self.drawn else ''
+        self.stream.write(up + '\n'.join(['\x1b[2K' + line for line in lines]) + ('\n' if lines else ''))
+        self.stream.flush()
+        self.drawn = len(lines)
+
+    def _run(self):
+        while not self.stop.wait(self.refresh):
+            self._draw()
+
+    def close(self):
+        """
+            Stops the renderer thread, and draws the bars a last time.
+        """
+        self.stop.set()
+        self.thread.join()
+        self._draw()
+
+
+def benchmark(n=1000000):
+    """
+        Prints the cost of an update of the bar on top of an empty loop.
+    """
+    start = time.perf_counter()
+    for _ in range(n):
+        pass
+    empty = time.perf_counter() - start
+
+    bar = ProgressBar(n)
+    start = time.perf_counter()
+    for _ in range(n):
+        bar()
+    bar.close()
+    print(f"{1e9 * (time.perf_counter() - start - empty) / n:.0f} ns per update")
+
+
 if __name__ == "__main__":
     from tqdm import tqdm, trange
     from time import sleep
@@ -94,3 +284,5 @@ if __name__ == "__main__":
         sleep(0.1)
         bar(incr=1)
     bar.close()
+
+    benchmark()
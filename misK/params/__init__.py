@@ -0,0 +1,5 @@
+from misK._lazy import lazy_exports
+
+__all__ = ["load_params", "show_args"]
+
+__getattr__, __dir__ = lazy_exports(__name__, {name: "utils" for name in __all__})
@@ -1,4 +1,8 @@
+import copy
 import difflib
+import hashlib
+import os
+import pickle
 
 import yaml
 
@@ -6,18 +10,81 @@ from misK.printing.dictionary import hpprint
 from misK.utils import BColors
 
 
-def load_params(path, adjust=None, verbose=False):
+# the C implementation of the loader when libyaml is available, several times faster than the pure Python one.
+_LOADER = getattr(yaml, "CFullLoader", yaml.FullLoader)
+
+_CACHE = {}  # the parameters already loaded, by path, with the (mtime, size) of the file they were loaded from.
+
+
+def _parse(path, cache_dir=None):
+    """
+        Parses a .yaml file, going through the in-memory cache and then through the on-disk one, if any, which are
+        only used while the file keeps the same modification time and size.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    path = os.path.abspath(path)
+    if path in _CACHE and _CACHE[path][0] == key:
+        return _CACHE[path][1]
+
+    cached = None
+    if cache_dir is not None:
+        cached = os.path.join(cache_dir, hashlib.sha1(path.encode()).hexdigest() + ".pkl")
+        try:
+            with open(cached, 'rb') as file:
+                cached_key, params = pickle.load(file)
+            if cached_key == key:
+                _CACHE[path] = (key, params)
+                return params
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            pass
+
+    with open(path, 'r') as file:
+        params = yaml.load(file, Loader=_LOADER)
+    _CACHE[path] = (key, params)
+    if cached is not None:
+        # written aside and then moved, so that concurrent workers never read a partial cache file.
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}"
+        with open(tmp, 'wb') as file:
+            pickle.dump((key, params), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cached)
+    return params
+
+
+def _adjust(params, key, value):
+    """
+        Sets params[key] to value, where key may be a dotted path to a nested parameter and where a dictionary value
+        is merged into the existing dictionary rather than replacing it.
+    """
+    if key not in params and '.' in key:
+        head, key = key.split('.', 1)
+        if not isinstance(params.get(head), dict):
+            params[head] = {}
+        return _adjust(params[head], key, value)
+    if isinstance(value, dict) and isinstance(params.get(key), dict):
+        for sub_key, sub_value in value.items():
+            _adjust(params[key], sub_key, sub_value)
+    else:
+        params[key] = value
+
+
+def load_params(path, adjust=None, verbose=False, cache_dir=None):
     """
         Used to load parameters from a .yaml config file.
+        The parsed files are cached in memory, and optionally on disk, as long as they are not modified.
 
         Args
         ----
         path : str
             a path to the config file. does not need to end with '.yaml', but it can.
         adjust : dict
-            an adjustment dictionary to make punctual and custom correction of the config parameters.
+            an adjustment dictionary to make punctual and custom correction of the config parameters. the keys may be
+            dotted paths to nested parameters, e.g. 'optim.lr', and the dictionaries are merged recursively.
         verbose : bool
             triggers the verbose mode.
+        cache_dir : str, optional
+            a directory where to pickle the parsed files, shared by all the processes loading the same configs.
 
         Returns
         -------
@@ -29,9 +96,8 @@ def load_params(path, adjust=None, verbose=False):
 
     if verbose:
         print("loading parameters from", path, end='... ')
-    # open and load the parameters.
-    with open(path, 'r') as file:
-        kwargs = yaml.full_load(file)
+    # load the parameters, copied so that the cached ones are never adjusted.
+    kwargs = copy.deepcopy(_parse(path, cache_dir=cache_dir))
     if verbose:
         print("done")
 
@@ -42,7 +108,7 @@ def load_params(path, adjust=None, verbose=False):
         for key in adjust:
             if verbose:
                 print(" -", key, end='')
-            kwargs[key] = adjust[key]
+            _adjust(kwargs, key, adjust[key])
         if verbose:
             print()
 
@@ -0,0 +1,10 @@
+from misK._lazy import lazy_exports
+
+__all__ = ["StoreDictKeyPair", "DictSchema", "converter", "coerce"]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "StoreDictKeyPair": "dictionary",
+    "DictSchema": "schema",
+    "converter": "types",
+    "coerce": "types",
+})
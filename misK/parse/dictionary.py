@@ -1,6 +1,6 @@
 import argparse
-import difflib
 
+from misK.parse.schema import DictSchema
 from misK.printing.text import strad
 
 
@@ -27,38 +27,14 @@ class StoreDictKeyPair(argparse.Action):
 
         choices_were_given = self.choices is not None and len(list(self.choices)) > 0
 
-        # build the default dictionary using strings in choices, of the form "name:type:default".
-        self._default = {}
-        self._types = []
-        if choices_were_given:
-            for choice in self.choices:
-                name, typ, default = choice.split(':')  # split the strings.
-                self._types.append(typ)  # store the type.
-                self._default[name] = default  # make a new name-default pair.
+        # the names, types and defaults, from the strings in choices of the form "name:type:default".
+        self._schema = DictSchema.of(self.choices) if choices_were_given else None
 
         self._nb_propositions = 2  # the number of choices printed by the auto completion on typos.
 
         # build the format.
         if choices_were_given:
-            cols_w = []
-            for i in range(len(list(self.choices))):
-                col = max(len(list(self._default.keys())[i]), len(list(self._default.keys())[i]),
-                          len(list(self._default.values())[i]), len(self._types[i]))
-                cols_w.append(col)
-            cols_f = ["{: ^" + str(col) + '}' for col in cols_w]
-
-            line1 = "command | python src/main.py --{} ".format(self.dest) + ' '.join(["{}="] * len(list(self.choices)))
-            line2 = " names  | " + ' | '.join(["{}"] * len(list(self.choices)))
-            line3 = "default | " + ' | '.join(["{}"] * len(list(self.choices)))
-            line4 = " types  | " + ' | '.join(["{}"] * len(list(self.choices)))
-
-            lines = [line1.format(*self._default.keys()), "{}"] + [line.format(*cols_f) for line in
-                                                                   [line2, line3, line4]]
-            for i, content in enumerate([[], ["{}"], self._default.keys(), self._default.values(), self._types]):
-                lines[i] = lines[i].format(*list(content))
-
-            lines[1] = '+'.join(['-' * 8] + ['-' * (col_w + 2) for col_w in cols_w])
-            self.format = '\n'.join(lines)
+            self.format = self._schema.usage(self.dest)
         else:
             self.format = f"python path/to/main.py [*] KEY1=VAL1 KEY2=VAL2 ... KEYN=VALN "
 
@@ -81,30 +57,32 @@ class StoreDictKeyPair(argparse.Action):
             Throws:
                 (ValueError) raised when input is not of the form KEY=VAL, treated as a Warning.
                 (TypeError) raised when a user chosen key is not available.
+                (ValueError) raised when a value is not of the declared type of its key.
         """
-        my_dict = dict(self._default)
+        my_dict = self._schema.parse_defaults() if self._schema is not None else {}
+        given = {}
         k = ''
         for kv in values:
             try:
-                k, v = kv.split("=")
-                if len(self._default) > 0 and k not in self._default.keys():
+                k, v = kv.split("=", 1)
+                if self._schema is not None and k not in self._schema.types:
                     raise TypeError()
                 if v != '':
-                    my_dict[k] = v
+                    given[k] = v
             except ValueError:
                 warning_msg = f"usage of {' or '.join(self.option_strings)}:" + '\n' + self.format
                 raise Warning("CUSTOM" + warning_msg)
             except TypeError:
                 error_msg = f"unknown argument name '{k}' for {' and '.join(self.option_strings)}\n"
-                matches = difflib.get_close_matches(k, self._default.keys(), n=self._nb_propositions)
+                matches = self._schema.suggest(k, n=self._nb_propositions)
                 if matches:
                     error_msg += f"\tdid you mean: {' or '.join(matches)}?"
                 else:
                     error_msg += f"possible argument names for " + \
-                                 "{}:\n\t{}".format(' and '.join(self.option_strings), ", ".join(self._default.keys()))
+                                 "{}:\n\t{}".format(' and '.join(self.option_strings), ", ".join(self._schema.names))
                 raise ValueError("CUSTOM" + error_msg)
 
-        for k, v in my_dict.items():
-            my_dict[k] = strad(v)
+        for k, v in given.items():
+            my_dict[k] = self._schema.convert(k, v) if self._schema is not None else strad(v)
 
         setattr(namespace, self.dest, my_dict)
@@ -0,0 +1,140 @@
+import copy
+import difflib
+
+from misK.parse.types import converter
+from misK.printing.text import strad
+
+_SCHEMAS = {}  # the schemas already built, by choices.
+
+
+def _trigrams(word):
+    # the trigrams of the word, padded so that its first and last letters weigh more.
+    word = f"  {word.lower()} "
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def _converter(typ):
+    # the types unknown to converter, e.g. 'string', fall back to strad, as before the types were enforced.
+    try:
+        return converter(typ)
+    except ValueError:
+        return strad
+
+
+def _default(convert, default):
+    # an empty default leaves the name unset, and a default which is not of its type, e.g. None for a float, is
+    # kept as strad reads it.
+    if default == '':
+        return default
+    try:
+        return convert(default)
+    except ValueError:
+        return strad(default)
+
+
+class DictSchema:
+    """
+    The names, types and defaults described by the 'name:type:default' choices of a StoreDictKeyPair, parsed once.
+    The defaults are converted to their types once, the usage table is built once, and the names are indexed by
+    trigrams, so that the suggestions on a typo only compare the typo with the names sharing trigrams with it.
+    A schema is shared by all the parsers with the same choices, see DictSchema.of.
+    """
+
+    def __init__(self, choices):
+        """
+            Constructs a DictSchema instance.
+
+            Args:
+                choices (iterable of str): the choices, of the form "name:type:default".
+
+            Return:
+                (DictSchema) the constructed object.
+        """
+        self.choices = tuple(choices)
+        self.types, self.defaults, self.converters, self.values = {}, {}, {}, {}
+        for choice in self.choices:
+            name, typ, default = choice.split(':', 2)  # split the strings, the default may contain ':'.
+            self.types[name] = typ
+            self.defaults[name] = default
+            self.converters[name] = _converter(typ)
+            self.values[name] = _default(self.converters[name], default)
+        self.names = list(self.types)
+        # the values which need to be copied for each parsed dictionary not to share them.
+        self.mutable = [name for name, value in self.values.items() if isinstance(value, (list, dict))]
+
+        self.index = {}  # the names containing each trigram.
+        for name in self.names:
+            for trigram in _trigrams(name):
+                self.index.setdefault(trigram, []).append(name)
+        self.suggestions = {}  # the suggestions already given, by (typo, n).
+
+        self.table = self._table()
+
+    @classmethod
+    def of(cls, choices):
+        """
+            Gives the schema of the choices, built on the first call and shared by the next ones.
+        """
+        choices = tuple(choices)
+        if choices not in _SCHEMAS:
+            _SCHEMAS[choices] = cls(choices)
+        return _SCHEMAS[choices]
+
+    def _table(self):
+        # the names, defaults and types, in columns.
+        cols_w = [max(len(name), len(self.defaults[name]), len(self.types[name])) for name in self.names]
+        rows = [(" names  | ", self.names), ("default | ", self.defaults.values()), (" types  | ", self.types.values())]
+        lines = ['+'.join(['-' * 8] + ['-' * (col_w + 2) for col_w in cols_w])]
+        for head, cells in rows:
+            lines.append(head + ' | '.join([f"{cell:^{col_w}}" for cell, col_w in zip(cells, cols_w)]))
+        return '\n'.join(lines)
+
+    def usage(self, dest):
+        """
+            Gives the usage of the option storing the dictionary in 'dest', i.e. an example command and the table of
+            the names, defaults and types.
+        """
+        return f"command | python src/main.py --{dest} " + ' '.join([f"{name}=" for name in self.names]) + '\n' + \
+            self.table
+
+    def parse_defaults(self):
+        """
+            Gives a new dictionary of the converted defaults.
+        """
+        values = dict(self.values)
+        for name in self.mutable:
+            values[name] = copy.deepcopy(values[name])
+        return values
+
+    def convert(self, name, value):
+        """
+            Converts the value of a name into its declared type.
+
+            Throws:
+                (ValueError) raised when the value is not of the declared type of the name.
+        """
+        try:
+            return self.converters[name](value)
+        except ValueError:
+            raise ValueError("CUSTOM" + f"invalid value '{value}' for '{name}' of type '{self.types[name]}'")
+
+    def suggest(self, typo, n=2, cutoff=0.6):
+        """
+            Gives the names closest to a typo, as difflib.get_close_matches would, but only comparing the typo with
+            the names sharing at least a trigram with it. A name sharing none, e.g. 'ba' for 'ab', is not suggested
+            even when difflib would have found it close enough.
+
+            Args:
+                typo (str): the unknown name.
+                n (int): the maximum number of suggestions.
+                cutoff (float): the minimum similarity, in [0, 1], of a suggestion.
+
+            Return:
+                (list of str) the suggestions, the closest first.
+        """
+        if (typo, n) not in self.suggestions:
+            # the index only excludes the names sharing no trigram with the typo, all the others being compared.
+            candidates = {name for trigram in _trigrams(typo) for name in self.index.get(trigram, [])}
+            candidates = [name for name in self.names if name in candidates]
+            self.suggestions[(typo, n)] = difflib.get_close_matches(typo, candidates, n=n, cutoff=cutoff)
+        return self.suggestions[(typo, n)]
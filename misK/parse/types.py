@@ -0,0 +1,126 @@
+import functools
+
+from misK.printing.text import (split_items,
+                                strad)
+
+
+def _int(string):
+    # the integers may be written in scientific notation, e.g. 1e6 steps.
+    try:
+        return int(string)
+    except ValueError:
+        value = float(string)
+        if not value.is_integer():
+            raise ValueError(f"{string} is not an integer")
+        return int(value)
+
+
+def _bool(string):
+    if string in ["True", "true", "1"]:
+        return True
+    if string in ["False", "false", "0"]:
+        return False
+    raise ValueError(f"{string} is not a boolean")
+
+
+def _none(string):
+    if string in ["None", "none", "null", ""]:
+        return None
+    raise ValueError(f"{string} is not None")
+
+
+def _str(string):
+    return string
+
+
+_SCALARS = {"int": _int, "float": float, "bool": _bool, "str": _str, "None": _none, "any": strad}
+
+
+def _items(string):
+    # the items of a compound value, with or without its enclosing brackets.
+    if string[:1] + string[-1:] in ["[]", "()", "{}"]:
+        string = string[1:-1]
+    return split_items(string)
+
+
+def _union(converters, typ):
+    def convert(string):
+        for conv in converters:
+            try:
+                return conv(string)
+            except ValueError:
+                pass
+        raise ValueError(f"{string} is not of type {typ}")
+
+    return convert
+
+
+def _list(conv):
+    def convert(string):
+        return [conv(item) for item in _items(string)]
+
+    return convert
+
+
+def _tuple(converters, typ):
+    def convert(string):
+        items = _items(string)
+        if len(items) != len(converters):
+            raise ValueError(f"{string} is not of type {typ}")
+        return tuple(conv(item) for conv, item in zip(converters, items))
+
+    return convert
+
+
+def _dict(key_conv, value_conv):
+    def convert(string):
+        pairs = [split_items(item, sep=':') for item in _items(string)]
+        if any(len(pair) != 2 for pair in pairs):
+            raise ValueError(f"{string} is not a dictionary of KEY:VAL pairs")
+        return {key_conv(key): value_conv(value) for key, value in pairs}
+
+    return convert
+
+
+@functools.lru_cache(maxsize=None)
+def converter(typ):
+    """
+        Compiles the function converting a string into a value of a given type, once per type.
+
+        Args:
+            typ (str): the type, either a scalar one, i.e. 'int', 'float', 'bool', 'str', 'None' or 'any' (see strad),
+                or a compound one, i.e. 'list[T]', 'tuple[T1,T2,...]', 'dict[K,V]' or a union 'T1|T2', e.g.
+                'list[int]|None'. The compound values are written as '[1,2]', '(1,2)', 'a:1,b:2' or '{a:1,b:2}'.
+
+        Return:
+            (function) the converter, raising a ValueError on a string which is not of the type.
+
+        Throws:
+            (ValueError) raised when the type is unknown.
+    """
+    typ = typ.replace(' ', '')
+    union = split_items(typ, sep='|')
+    if len(union) > 1:
+        return _union([converter(part) for part in union], typ)
+
+    if typ[-1:] == ']' and '[' in typ:
+        outer, inner = typ[:-1].split('[', 1)
+        args = split_items(inner)
+        if outer == "list" and len(args) == 1:
+            return _list(converter(args[0]))
+        if outer == "tuple" and len(args) > 0:
+            return _tuple([converter(arg) for arg in args], typ)
+        if outer == "dict" and len(args) == 2:
+            return _dict(converter(args[0]), converter(args[1]))
+
+    if typ in _SCALARS:
+        return _SCALARS[typ]
+    raise ValueError(f"unknown type '{typ}'")
+
+
+def coerce(value, typ):
+    """
+        Converts a string into a value of a given type, see converter. The values which are not strings are returned
+        as they are.
+    """
+    return converter(typ)(value) if isinstance(value, str) else value
@@ -0,0 +1,5 @@
+from misK._lazy import lazy_exports
+
+__all__ = ["show_images_grid"]
+
+__getattr__, __dir__ = lazy_exports(__name__, {name: "plots" for name in __all__})
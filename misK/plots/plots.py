@@ -1,8 +1,7 @@
-from matplotlib import pyplot as plt
-from torchvision.utils import make_grid
-
-
 def show_images_grid(images, nrow=4, show=False, tight_layout=True, save=None):
+    from matplotlib import pyplot as plt
+    from torchvision.utils import make_grid
+
     images = make_grid(images, nrow=nrow)
     plt.imshow(images.permute(1, 2, 0), cmap="gray")
     plt.axis('off')
@@ -0,0 +1,12 @@
+from misK._lazy import lazy_exports
+
+__all__ = ["logger", "Dashboard", "hpprint", "TableRenderer", "terminal_width", "LogSink", "vprint", "verror",
+           "give_heading", "strad", "exceptionizer"]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "logger": "logger",
+    **{name: "dictionary" for name in ["hpprint", "TableRenderer", "terminal_width"]},
+    "LogSink": "sink",
+    "Dashboard": "dashboard",
+    **{name: "text" for name in ["vprint", "verror", "give_heading", "strad", "exceptionizer"]},
+})
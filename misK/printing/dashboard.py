@@ -0,0 +1,162 @@
+import sys
+import threading
+import time
+import traceback
+
+from misK.printing.dictionary import (_table,
+                                      redraw,
+                                      regex,
+                                      terminal_width)
+from misK.utils import BColors
+
+
+def _format(value):
+    """
+        Formats a metric: the floats with 4 significant digits, and the sequences of numbers, e.g. a statistic of each
+        environment, as their mean followed by their [min, max] range. The 0-d arrays and tensors, e.g. a loss, are
+        formatted as the scalar they hold.
+    """
+    if getattr(value, "ndim", None) == 0 and hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    if hasattr(value, "__len__") and not isinstance(value, (str, dict)) and len(value) > 0:
+        try:
+            values = [float(v) for v in value]
+        except (TypeError, ValueError):
+            return str(value)
+        return f"{sum(values) / len(values):.4g} [{min(values):.4g}, {max(values):.4g}]"
+    return str(list(value.keys()) if isinstance(value, dict) else value)
+
+
+def _cut(line, width):
+    """
+        Cuts a line to 'width' visible characters, keeping its escape sequences, and resetting the style if the line
+        was cut, so that a cut color does not bleed into the next lines.
+    """
+    if len(regex.sub('', line)) <= width:
+        return line
+    out, visible, start = [], 0, 0
+    for escape in regex.finditer(line):
+        text = line[start:escape.start()][:max(width - visible, 0)]
+        visible += len(text)
+        out += [text, escape.group()]
+        start = escape.end()
+    out.append(line[start:][:max(width - visible, 0)])
+    return ''.join(out) + BColors.ENDC
+
+
+class Dashboard:
+    """
+    A live view of the metrics of a training loop, redrawn in a fixed region of the terminal by a renderer thread.
+    The loop pushes its metrics without ever printing: a push only updates a dictionary, and the renderer redraws the
+    tables of the sections, in the format of hpprint, at most every 'refresh' seconds and only when something was
+    pushed, rewriting the lines that changed.
+    The values are formatted by the renderer, so that an array pushed must not be modified in place afterwards.
+    """
+
+    def __init__(self, heading='', refresh=0.25, height=None, color="CBLUE2", stream=None):
+        """
+            Constructs a Dashboard instance, and starts its renderer thread.
+
+            Args:
+                heading (str): the title of the dashboard.
+                refresh (float): the minimum number of seconds between two redraws.
+                height (int): the number of lines of the region, the lines beyond being cut. None for a region growing
+                    in place with the metrics, and never shrinking.
+                color (str): the name of the BColors color of the title.
+                stream (file): where to draw the dashboard. Defaults to sys.stdout.
+
+            Return:
+                (Dashboard) the constructed object.
+        """
+        self.heading = heading
+        self.refresh = refresh
+        self.height = height
+        self.color = getattr(BColors, color, '')
+        self.stream = sys.stdout if stream is None else stream
+
+        self.sections = {}  # the last value pushed for each metric, by section.
+        self.version, self.drawn_version = 0, -1
+        self.widths = {}  # the width of the column of each (section, metric), which only grows.
+        self.lines = []  # the lines currently drawn.
+        self.start = time.time()
+
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def push(self, metrics, section=''):
+        """
+            Updates metrics, without blocking: the dashboard is only redrawn by its renderer thread.
+
+            Args:
+                metrics (dict): the new value of each metric, e.g. a number, or a sequence of numbers with one value
+                    per environment.
+                section (str): the section of the metrics, each section being drawn as its own table.
+
+            Return:
+                (None)
+        """
+        self.sections.setdefault(section, {}).update(metrics)
+        self.version += 1
+
+    def _lines(self):
+        elapsed = int(time.time() - self.start)
+        lines = [f"{self.color}{self.heading}{BColors.ENDC} [{elapsed // 60:02d}:{elapsed % 60:02d}]"]
+        columns = terminal_width()
+        for section, metrics in list(self.sections.items()):
+            if section:
+                lines.append(BColors.BOLD + section + BColors.ENDC)
+            cells = [(str(key), _format(value)) for key, value in dict(metrics).items()]
+            for key, value in cells:
+                width = self.widths.get((section, key), 0)
+                self.widths[(section, key)] = max(width, len(key), len(value))
+            lines += _table(cells, [self.widths[(section, key)] for key, _ in cells], '  ', 2, columns)
+        if self.height is not None:
+            lines = lines[:self.height] + [''] * (self.height - len(lines))
+        # the lines are cut to the terminal, as a wrapped line would shift the region.
+        return [_cut(line, columns - 1) for line in lines]
+
+    def _draw(self):
+        version = self.version
+        lines = self._lines()
+        if len(lines) < len(self.lines):
+            # the region never shrinks.
+            lines += [''] * (len(self.lines) - len(lines))
+        # a region growing is drawn over the previous one, see redraw.
+        redraw(self.stream, lines, self.lines)
+        self.lines, self.drawn_version = lines, version
+
+    def _run(self):
+        while not self.stop.wait(self.refresh):
+            if self.version != self.drawn_version:
+                try:
+                    self._draw()
+                except Exception:
+                    # reported below the region, which is drawn again from there, so that the renderer survives a
+                    # value it fails to draw.
+                    self.stream.write(f"\n{BColors.CRED}{traceback.format_exc()}{BColors.ENDC}")
+                    self.stream.flush()
+                    self.lines, self.drawn_version = [], self.version
+
+    def close(self):
+        """
+            Stops the renderer thread, and draws the dashboard a last time.
+        """
+        self.stop.set()
+        self.thread.join()
+        self._draw()
+
+
+if __name__ == "__main__":
+    import random
+
+    dashboard = Dashboard(heading="training", refresh=0.1)
+    n, start = 200000, time.perf_counter()
+    for step in range(n):
+        dashboard.push({"step": step, "fps": step / (time.perf_counter() - start + 1e-9)})
+        if step % 1000 == 0:
+            dashboard.push({"reward": [random.random() for _ in range(16)], "loss": random.random()}, section="agent")
+    dashboard.close()
+    print(f"{1e9 * (time.perf_counter() - start) / n:.0f} ns per push")
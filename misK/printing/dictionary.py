@@ -1,5 +1,8 @@
-import os
 import re
+import shutil
+import signal
+import sys
+import threading
 
 regex = re.compile(r"""
     \x1b     # literal ESC
@@ -9,6 +12,82 @@ regex = re.compile(r"""
     """, re.VERBOSE)
 
 
+_TERMINAL = {"width": None, "watched": False}  # the cached width of the terminal.
+
+
+def terminal_width():
+    """
+        Gives the width of the terminal, read once and then refreshed on SIGWINCH, i.e. when the terminal is resized.
+        Falls back to 1024 columns when the output is not a terminal.
+
+        Return:
+            (int) the number of columns of the terminal.
+    """
+    if _TERMINAL["width"] is None or not _TERMINAL["watched"]:
+        _TERMINAL["width"] = shutil.get_terminal_size((1024, 24))[0]
+        # signals can only be handled from the main thread, and SIGWINCH does not exist on Windows.
+        if hasattr(signal, "SIGWINCH") and threading.current_thread() is threading.main_thread():
+            previous = signal.getsignal(signal.SIGWINCH)
+
+            def on_resize(signum, frame):
+                _TERMINAL["width"] = shutil.get_terminal_size((1024, 24))[0]
+                if callable(previous):
+                    previous(signum, frame)
+
+            signal.signal(signal.SIGWINCH, on_resize)
+            _TERMINAL["watched"] = True
+    return _TERMINAL["width"]
+
+
+def _cells(dicti):
+    # the strings of the keys and of the values, the dictionaries being shown by their keys.
+    return [(str(key), str(list(value.keys()) if isinstance(value, dict) else value)) for key, value in dicti.items()]
+
+
+def _table(cells, widths, heading, heading_l, columns):
+    """
+        Lays the cells out in blocks of three lines, names, values and separator, wrapped to fit in 'columns'.
+    """
+    lines, names, values, inter, length = [], [], [], [], 0
+    for (key, value), col_width in zip(cells, widths):
+        if names and heading_l + length + col_width + 2 > columns:
+            lines += [heading + ''.join(names), heading + ''.join(values), heading + ''.join(inter)[:-1]]
+            names, values, inter, length = [], [], [], 0
+        names.append(key.rjust(col_width) + " | ")
+        values.append(value.rjust(col_width) + " | ")
+        inter.append('-' * (col_width + 3))
+        length += col_width + 3
+    return lines + [heading + ''.join(names), heading + ''.join(values), heading + ''.join(inter)[:-1]]
+
+
+def redraw(stream, lines, previous):
+    """
+        Prints lines over the ones previously printed, rewriting only the lines that changed.
+
+        Args:
+            stream (file): where the lines are printed.
+            lines (list): the lines to print, without their newlines.
+            previous (list): the lines printed last, the cursor being just below them.
+
+        Return:
+            (None)
+    """
+    # back to the first line printed last, if any.
+    out = [f"\x1b[{len(previous)}F"] if previous else []
+    if len(lines) != len(previous):
+        # the layout changed: all the lines are rewritten, and the lines left below them are cleared.
+        out += ["\x1b[2K" + line + '\n' for line in lines]
+        extra = len(previous) - len(lines)
+        if extra > 0:
+            out += ["\x1b[2K\n"] * extra + [f"\x1b[{extra}F"]
+    else:
+        # rewriting the lines that changed and skipping the others.
+        for line, old in zip(lines, previous):
+            out.append("\x1b[1E" if line == old else "\x1b[2K" + line + '\n')
+    stream.write(''.join(out))
+    stream.flush()
+
+
 def hpprint(dicti, heading='', end='\n'):
     """
         Prints a dictionary in a two rows table, with each column representing a field of the dictionary.
@@ -21,23 +100,51 @@ def hpprint(dicti, heading='', end='\n'):
         Return:
             (None)
     """
-    columns, _ = os.get_terminal_size()
-    columns = 1024 if columns == 0 else columns
-
-    regex.findall(heading)
-    heading_l = len(str(regex.sub("", heading)))
-
-    dict_repr = ""
-    names, values, inter = '', '', ''
-    for key, value in dicti.items():
-        col_width = max(len(str(key)), len(str(value)))
-        if heading_l + len(names) + col_width + 2 > columns:
-            dict_repr += heading + names + '\n' + heading + values + '\n' + heading + inter[:-1] + '\n'
-            names, values, inter = '', '', ''
-        names += ("{: >" + str(col_width) + "} | ").format(key)
-        if value.__class__.__name__ == "dict":
-            value = list(value.keys())
-        values += ("{: >" + str(col_width) + "} | ").format(str(value))
-        inter += '-' * (col_width + 3)
-    dict_repr += heading + names + '\n' + heading + values + '\n' + heading + inter[:-1]
-    print(dict_repr, end=end)
+    heading_l = len(regex.sub("", heading))
+    cells = _cells(dicti)
+    widths = [max(len(key), len(value)) for key, value in cells]
+    print('\n'.join(_table(cells, widths, heading, heading_l, terminal_width())), end=end)
+
+
+class TableRenderer:
+    """
+    Prints a dictionary of metrics in the table of hpprint and refreshes it in place, e.g. once per step.
+    The width of each column only grows, so that the layout stays the same from one refresh to the next, and only the
+    lines whose content changed, usually the values, are rewritten.
+    """
+
+    def __init__(self, heading='', stream=None):
+        """
+            Constructs a TableRenderer instance.
+
+            Args:
+                heading (str): a simple heading to make printing prettier.
+                stream (file): where to print the table. Defaults to sys.stdout.
+
+            Return:
+                (TableRenderer) the constructed object.
+        """
+        self.heading = heading
+        self.heading_l = len(regex.sub("", heading))
+        self.stream = stream
+        self.widths = {}  # the width of the column of each key.
+        self.lines = []  # the lines currently printed.
+
+    def refresh(self, dicti):
+        """
+            Prints the table of the dictionary over the previous one.
+
+            Args:
+                dicti (dict): the dictionary to display.
+
+            Return:
+                (None)
+        """
+        stream = sys.stdout if self.stream is None else self.stream
+        cells = _cells(dicti)
+        for key, value in cells:
+            self.widths[key] = max(self.widths.get(key, 0), len(key), len(value))
+        lines = _table(cells, [self.widths[key] for key, _ in cells], self.heading, self.heading_l, terminal_width())
+
+        redraw(stream, lines, self.lines)
+        self.lines = lines
@@ -1,30 +1,148 @@
-import traceback
-from datetime import datetime
+import os
+import queue
+import sys
+import threading
+import time
 
 FILE = None
 FUNC = None
 MOTHER_FUNCTION = None
 FUNCTION_CHANGE = False
+WRITER = None
+QUEUE = None
+SINK = None
 
 VERBOSE = False
 
+_CALLERS = {}  # the formatted '[file][func][line]' of each code location already seen, with its file, func and line.
+_SECOND = [None, '']  # the last second formatted by _now, and its formatting.
 
-def _get_head(depth=1):
+
+def _now():
+    now = time.time()
+    second = int(now)
+    if second != _SECOND[0]:
+        _SECOND[0], _SECOND[1] = second, time.strftime("%d/%m/%Y %H:%M:%S", time.localtime(second))
+    return f"{_SECOND[1]},{int((now - second) * 1e6):06d}"
+
+
+def _caller(depth=1):
     global FUNC
-    stack = traceback.format_stack()
-    file, line, FUNC = stack[-2 - depth].split('\n')[0].split(", ")
-    file = file.split('"')[1]
-    line = line.split(' ')[1]
-    FUNC = FUNC.split(' ')[1]
-    now = datetime.now().strftime("%d/%m/%Y %H:%M:%S,%f")
+    # the caller is read from its frame, and formatted once per code location.
+    frame = sys._getframe(depth + 1)
+    key = (frame.f_code, frame.f_lineno)
+    caller = _CALLERS.get(key)
+    if caller is None:
+        code = frame.f_code
+        caller = _CALLERS[key] = (f"[{code.co_filename}][{code.co_name}][{frame.f_lineno}]",
+                                  code.co_filename, code.co_name, frame.f_lineno)
+    FUNC = caller[2]
+
+    return caller
+
+
+def _get_head(depth=1):
+    return f"[{_now()}]{_caller(depth + 1)[0]}[LOG] "
+
+
+def _put(caller, msg):
+    QUEUE.put((_now(), os.getpid(), caller[1], caller[2], caller[3], msg))
+
+
+class _Writer(threading.Thread):
+    """
+        A background thread writing the lines of the logger, all the lines queued since its last write at once.
+    """
+
+    def __init__(self, file):
+        super().__init__(daemon=True)
+        self.file = file
+        self.lines = queue.SimpleQueue()
+
+    def run(self):
+        stop = False
+        while not stop:
+            lines = [self.lines.get()]
+            while True:
+                try:
+                    lines.append(self.lines.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in lines
+            self.file.write(''.join([line for line in lines if line is not None]))
+            self.file.flush()
+
+    def write(self, line):
+        self.lines.put(line)
+
+    def close(self):
+        self.lines.put(None)
+        self.join()
+
+
+def _write(line):
+    if WRITER is not None:
+        WRITER.write(line)
+    else:
+        FILE.write(line)
 
-    return f"[{now}][{file}][{FUNC}][{line}][LOG] "
 
+def open_logger(filename, mode='a', verbose=False, threaded=False):
+    """
+        Opens the log file.
 
-def open_logger(filename, mode='a', verbose=False):
-    global FILE, VERBOSE
+        Args:
+            filename (str): the path to the log file.
+            mode (str): the mode to open the file with.
+            verbose (bool): turns the logging on.
+            threaded (bool): hands the lines to a background thread, writing them in batches, instead of writing them
+                from the logging thread.
+
+        Return:
+            (None)
+    """
+    global FILE, VERBOSE, WRITER
     FILE = open(filename, mode=mode)
-    FILE.write(_get_head() + "logger opened." + '\n')
+    if threaded:
+        WRITER = _Writer(FILE)
+        WRITER.start()
+    _write(_get_head() + "logger opened." + '\n')
+    VERBOSE = verbose
+
+
+def open_sink(filename, verbose=False, **kwargs):
+    """
+        Opens a LogSink, gathering the records of this process and of the ones connected to it into a single file.
+
+        Args:
+            filename (str): the path to the log file.
+            verbose (bool): turns the logging on.
+            kwargs (dict): the format and the rotation arguments of the sink, see LogSink.
+
+        Return:
+            (LogSink) the sink, whose queue is to be given to connect in the other processes.
+    """
+    from misK.printing.sink import LogSink
+    global SINK
+    SINK = LogSink(filename, **kwargs)
+    connect(SINK.queue, verbose=verbose)
+    _put(_caller(), "logger opened.")
+    return SINK
+
+
+def connect(queue, verbose=True):
+    """
+        Sends the records logged by this process to the queue of a LogSink, e.g. from a worker process.
+
+        Args:
+            queue (multiprocessing.Queue): the queue of the sink.
+            verbose (bool): turns the logging on.
+
+        Return:
+            (None)
+    """
+    global QUEUE, VERBOSE
+    QUEUE = queue
     VERBOSE = verbose
 
 
@@ -33,7 +151,7 @@ def log(*args, prt=True, log=True, **kwargs):
     if VERBOSE:
         global FUNCTION_CHANGE, MOTHER_FUNCTION, FILE, FUNC
 
-        head = _get_head()
+        caller = _caller()
 
         FUNCTION_CHANGE = FUNC != MOTHER_FUNCTION
         MOTHER_FUNCTION = FUNC
@@ -42,10 +160,10 @@ def log(*args, prt=True, log=True, **kwargs):
             if FUNCTION_CHANGE:
                 print()
             print("[@]", *args, **kwargs)
-        if log:
-            if FUNCTION_CHANGE:
-                FILE.write('\n')
-            FILE.write(head + ' '.join(map(str, args)) + '\n')
+        if log and QUEUE is not None:
+            _put(caller, ' '.join(map(str, args)))
+        elif log:
+            _write(('\n' if FUNCTION_CHANGE else '') + f"[{_now()}]{caller[0]}[LOG] " + ' '.join(map(str, args)) + '\n')
 
 
 def void(*args, **kwargs):
@@ -53,7 +171,14 @@ def void(*args, **kwargs):
 
 
 def close_logger():
-    global FUNCTION_CHANGE, MOTHER_FUNCTION, FILE, FUNC, VERBOSE
+    global FUNCTION_CHANGE, MOTHER_FUNCTION, FILE, FUNC, VERBOSE, WRITER, QUEUE, SINK
+    if QUEUE is not None:
+        if SINK is not None:
+            _put(_caller(), "logger closed.")
+            SINK.close()
+            SINK = None
+        QUEUE = None
+
     if FILE is not None and not FILE.closed:
 
         head = _get_head()
@@ -63,10 +188,13 @@ def close_logger():
 
         if FUNCTION_CHANGE:
             print()
-            FILE.write('\n')
-        FILE.write(head + "logger closed." + '\n')
-        FILE.write('-'*100 + "\n")
-        FILE.write('-'*100 + "\n")
+            _write('\n')
+        _write(head + "logger closed." + '\n')
+        _write('-'*100 + "\n")
+        _write('-'*100 + "\n")
+        if WRITER is not None:
+            WRITER.close()
+            WRITER = None
         FILE.close()
 
     VERBOSE = False
@@ -89,7 +217,44 @@ def main(log=print):
     log("end")
 
 
+def benchmark(n=100000):
+    """
+        Compares the number of lines logged per second by the former traceback based heads and by the current
+        logger, with and without its background writer.
+    """
+    import os
+    import tempfile
+    import traceback
+    from datetime import datetime
+
+    def traceback_head(depth=1):
+        stack = traceback.format_stack()
+        file, line, func = stack[-2 - depth].split('\n')[0].split(", ")
+        file = file.split('"')[1]
+        line = line.split(' ')[1]
+        func = func.split(' ')[1]
+        now = datetime.now().strftime("%d/%m/%Y %H:%M:%S,%f")
+        return f"[{now}][{file}][{func}][{line}][LOG] "
+
+    path = os.path.join(tempfile.mkdtemp(), "benchmark.log")
+    with open(path, 'w') as f:
+        start = time.perf_counter()
+        for i in range(n):
+            f.write(traceback_head() + ' '.join(map(str, ["line", i])) + '\n')
+        print(f"{'traceback heads':>20} | {n / (time.perf_counter() - start):>10.0f} lines/s")
+
+    for threaded in [False, True]:
+        open_logger(path, verbose=True, threaded=threaded)
+        start = time.perf_counter()
+        for i in range(n):
+            log("line", i, prt=False)
+        close_logger()
+        name = "background writer" if threaded else "frame heads"
+        print(f"{name:>20} | {n / (time.perf_counter() - start):>10.0f} lines/s")
+
+
 if __name__ == "__main__":
     open_logger("log/log.log", verbose=True)
     main(log=log)
     close_logger()
+    benchmark()
@@ -0,0 +1,110 @@
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+# the columns of a log record.
+FIELDS = ("time", "pid", "file", "func", "line", "msg")
+
+
+class LogSink:
+    """
+    Receives the log records of any number of threads and processes through a multiprocessing queue, and writes them
+    into a single file from a thread of the process owning the sink, rotating the file by size and/or time.
+    The records are tuples following FIELDS, written either in the '[time][file][func][line][LOG] msg' text format of
+    misK.printing.logger or as JSON lines with one key per field.
+    The queue can only be given to a process when it starts, e.g. as an argument of multiprocessing.Process or through
+    the initializer of a SubprocVecEnv, and not inside the cloudpickled env_fns.
+    """
+
+    def __init__(self, filename, fmt="text", max_bytes=0, interval=0, backup_count=5, context='spawn'):
+        """
+            Constructs a LogSink instance, and starts its writing thread.
+
+            Args:
+                filename (str): the path to the log file.
+                fmt (str): the format of the records, 'text' or 'jsonl'.
+                max_bytes (int): rotates the file once it reaches that size. 0 to never rotate on size.
+                interval (float): rotates the file once it is that many seconds old. 0 to never rotate on time.
+                backup_count (int): the number of rotated files kept, as filename.1 (newest) to filename.N.
+                context (str): the multiprocessing start method of the queue, which must be the one of the processes
+                    it is given to. Defaults to 'spawn', the one of SubprocVecEnv.
+
+            Return:
+                (LogSink) the constructed object.
+        """
+        if fmt not in ["text", "jsonl"]:
+            raise ValueError(f"unknown format '{fmt}', expected 'text' or 'jsonl'")
+        self.filename = filename
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+
+        self.queue = mp.get_context(context).Queue()
+        self.file, self.opened = None, 0.
+        self._open()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _open(self):
+        self.file = open(self.filename, 'a')
+        self.opened = time.time()
+
+    def _rotate(self):
+        self.file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                if os.path.exists(f"{self.filename}.{i}"):
+                    os.replace(f"{self.filename}.{i}", f"{self.filename}.{i + 1}")
+            os.replace(self.filename, f"{self.filename}.1")
+        else:
+            os.remove(self.filename)
+        self._open()
+
+    def _needs_rotation(self):
+        if self.max_bytes > 0 and self.file.tell() >= self.max_bytes:
+            return True
+        return self.interval > 0 and time.time() - self.opened >= self.interval
+
+    def format(self, record):
+        """
+            Formats a record into a line of the file.
+
+            Args:
+                record (tuple): the record, following FIELDS.
+
+            Return:
+                (str) the line, with its trailing newline.
+        """
+        if self.fmt == "jsonl":
+            return json.dumps(dict(zip(FIELDS, record))) + '\n'
+        now, _, file, func, line, msg = record
+        return f"[{now}][{file}][{func}][{line}][LOG] {msg}\n"
+
+    def _run(self):
+        stop = False
+        while not stop:
+            records = [self.queue.get()]
+            while True:
+                try:
+                    records.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in records
+            self.file.write(''.join([self.format(record) for record in records if record is not None]))
+            self.file.flush()
+            if not stop and self._needs_rotation():
+                self._rotate()
+
+    def close(self):
+        """
+            Waits for all the queued records to be written, and closes the file.
+        """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.file.close()
+        self.queue.close()
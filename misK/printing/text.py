@@ -1,3 +1,4 @@
+import re
 import sys
 import traceback
 
@@ -41,28 +42,64 @@ def give_heading(text='', ll=6):
            sty.fg(0, 0, 0) + ("{: ^" + str(ll) + "}").format(text[:ll]) + ' ' + sty.fg.rs + sty.bg.rs + ' '
 
 
+# the integers and the floats, with their sign and in scientific notation.
+_INT = re.compile(r"[+-]?\d+")
+_FLOAT = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?|[+-]?(inf|nan)")
+
+
+def split_items(string, sep=','):
+    """
+        Splits a string on the separators which are not nested in brackets, e.g. '1,[2,3],(4,5)' into
+        ['1', '[2,3]', '(4,5)'].
+
+        Args:
+            string (str): the string to split.
+            sep (str): the separator, a single character.
+
+        Return:
+            (list of str) the items, stripped. An empty string gives no item.
+    """
+    items, depth, start = [], 0, 0
+    for i, char in enumerate(string):
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == sep and depth == 0:
+            items.append(string[start:i].strip())
+            start = i + 1
+    items.append(string[start:].strip())
+    return [] if items == [''] else items
+
+
 def strad(string):
     """
-        Converts a string into its representation, i.e. integer, float or bool, if possible.
+        Converts a string into its representation, i.e. integer, float, bool, None or list of those, if possible.
 
         Args:
             string (str): the string representation one wants to convert to its 'true' value.
 
         Return:
-            (str, int, float, bool) the 'true' value of the input string representation.
+            (str, int, float, bool, None, list) the 'true' value of the input string representation.
     """
-    if string.__class__.__name__ != "str":
+    if not isinstance(string, str):
         return string
 
     if string in ["True", "False"]:
         return True if string == "True" else False
 
-    if string.isdigit():
+    if string == "None":
+        return None
+
+    if _INT.fullmatch(string):
         return int(string)
 
-    elif string.replace('.', '', 1).isdigit():
+    elif _FLOAT.fullmatch(string):
         return float(string)
 
+    elif string[:1] == '[' and string[-1:] == ']':
+        return [strad(item) for item in split_items(string[1:-1])]
+
     return string
 
 
@@ -0,0 +1,5 @@
+from misK._lazy import lazy_exports
+
+__all__ = ["wrappers"]
+
+__getattr__, __dir__ = lazy_exports(__name__, {"wrappers": "wrappers"})
@@ -0,0 +1,20 @@
+from misK._lazy import lazy_exports
+
+_EXPORTS = {
+    "base": ["VecEnv", "VecEnvWrapper", "VecEnvObservationWrapper", "CloudpickleWrapper"],
+    "dummy": ["RandomEnv", "RandomVecEnv"],
+    "errors": ["AlreadySteppingError", "NotSteppingError"],
+    "interact": ["TrackAgent"],
+    "proba": ["RunningMeanStd"],
+    "profiling": ["StepProfiler"],
+    "recording": ["Recorder", "ViewerWrapper", "PNGBackend", "VideoBackend", "ChunkedBackend"],
+    "restrictions": ["LimitEpisode"],
+    "subproc": ["SubprocVecEnv"],
+    "trajectories": ["TrajectoryStore", "TrajectoryReader"],
+    "transformations": ["VecFrameStack", "VecExtractDictObs", "VecNormalize", "TransposeFrame", "ScaledFloatFrame",
+                        "ObsPipeline", "SymmetricEnv"],
+}
+
+__all__ = [name for names in _EXPORTS.values() for name in names]
+
+__getattr__, __dir__ = lazy_exports(__name__, {name: module for module, names in _EXPORTS.items() for name in names})
@@ -104,10 +104,10 @@ class VecEnv(ABC):
 
     @property
     def unwrapped(self):
-        if isinstance(self, VecEnvWrapper):
-            return self.venv.unwrapped
-        else:
-            return self
+        env = self
+        while isinstance(env, VecEnvWrapper):
+            env = env.__dict__['venv']
+        return env if isinstance(env, VecEnv) else env.unwrapped
 
     def get_viewer(self):
         if self.viewer is None:
@@ -120,8 +120,17 @@ class VecEnvWrapper(VecEnv):
     """
     An environment wrapper that applies to an entire batch
     of environments at once.
+
+    The attributes missing from a wrapper are forwarded to the first layer below that has them. That layer is
+    cached per wrapper and attribute name, until any wrapper gets a new venv or a new attribute.
     """
 
+    # the methods a wrapper only forwards to the layer below, when it does not override them.
+    FORWARDING_METHODS = ('step_async', 'close', 'get_images')
+
+    # bumped whenever the chains of wrappers may have changed, to invalidate the caches of forwarded attributes.
+    _chain_epoch = 0
+
     def __init__(self, venv, observation_space=None, action_space=None):
         self.venv = venv
         super().__init__(num_envs=venv.num_envs,
@@ -131,8 +140,26 @@ class VecEnvWrapper(VecEnv):
         self.ac_space = action_space or venv.action_space
         self.num = venv.num_envs
 
-    def step_async(self, actions):
-        self.venv.step_async(actions)
+    def step_async(self, actions, env_ids=None):
+        """
+            Forwards the actions to the layer below, with env_ids only when given, as only some vectorized
+            environments, e.g. SubprocVecEnv, step a subset of their environments.
+        """
+        if env_ids is None:
+            self.venv.step_async(actions)
+        else:
+            self.venv.step_async(actions, env_ids)
+
+    @property
+    def batch_ids(self):
+        """
+            The environments of the batch given by the last reset or step_wait of the layer below, as an index of
+            the per-environment arrays: slice(None) when the batch holds all the environments, and the array of their
+            ids otherwise, e.g. with an asynchronous SubprocVecEnv. Also the environments a step_async without
+            env_ids steps.
+        """
+        ids = getattr(self.venv, 'last_env_ids', None)
+        return slice(None) if ids is None or len(ids) == self.num_envs else ids
 
     @abstractmethod
     def reset(self):
@@ -151,10 +178,129 @@ class VecEnvWrapper(VecEnv):
     def get_images(self):
         return self.venv.get_images()
 
+    def enable_profiling(self, track_memory=False):
+        """
+            Starts timing the reset, step_async and step_wait methods of each layer of the wrapper stack.
+            The compiled layers of the stack are decompiled first, as their bindings would skip the layers in between,
+            and compiled again by disable_profiling.
+
+            Args
+            ----
+            track_memory : bool, optional
+                also measures the bytes allocated by each layer, with tracemalloc.
+
+            Returns
+            -------
+            profiler : StepProfiler
+                the profiler gathering the statistics, see StepProfiler.summary and StepProfiler.dump.
+        """
+        from misK.rl.procgen.wrappers.profiling import StepProfiler
+        self.disable_profiling()
+        compiled = []
+        layer = self
+        while isinstance(layer, VecEnvWrapper):
+            if '_compiled' in layer.__dict__:
+                layer.decompile()
+                compiled.append(layer)
+            layer = layer.__dict__['venv']
+        self.__dict__['_recompile'] = compiled
+        self.profiler = StepProfiler(track_memory=track_memory)
+        self.profiler.attach(self)
+        return self.profiler
+
+    def disable_profiling(self):
+        """
+            Stops the profiling started by enable_profiling.
+
+            Returns
+            -------
+            profiler : StepProfiler or None
+                the profiler, still holding the statistics, or None if the stack was not profiled.
+        """
+        profiler = self.__dict__.pop('profiler', None)
+        if profiler is not None:
+            profiler.detach()
+        for layer in reversed(self.__dict__.pop('_recompile', [])):
+            layer.compile()
+        return profiler
+
+    def compile(self):
+        """
+            Flattens the stack: each wrapper only forwarding one of the FORWARDING_METHODS to the layer below gets
+            that method bound directly to the first layer below implementing it, skipping the forwarding calls.
+            Undone by decompile. While the stack is profiled, the compilation is deferred to disable_profiling.
+
+            Returns
+            -------
+            self : VecEnvWrapper
+                this wrapper, compiled.
+        """
+        if 'profiler' in self.__dict__:
+            if self not in self.__dict__['_recompile']:
+                self.__dict__['_recompile'].insert(0, self)
+            return self
+        self.decompile()
+        layers = []
+        layer = self
+        while isinstance(layer, VecEnvWrapper):
+            layers.append(layer)
+            layer = layer.__dict__['venv']
+        compiled = []
+        for method in self.FORWARDING_METHODS:
+            target = getattr(layer, method)
+            for wrapper in reversed(layers):
+                forwards = getattr(type(wrapper), method) is getattr(VecEnvWrapper, method)
+                if forwards and method not in wrapper.__dict__:
+                    wrapper.__dict__[method] = target
+                    compiled.append((wrapper, method))
+                else:
+                    target = getattr(wrapper, method)
+        self.__dict__['_compiled'] = compiled
+        return self
+
+    def decompile(self):
+        """
+            Restores the forwarding methods bound by compile.
+        """
+        for wrapper, method in self.__dict__.pop('_compiled', []):
+            wrapper.__dict__.pop(method, None)
+
+    def _owner(self, name):
+        """
+            Gives the first layer below this wrapper having the attribute name, or the innermost environment.
+        """
+        layer = self.__dict__['venv']
+        while isinstance(layer, VecEnvWrapper):
+            if name in layer.__dict__ or hasattr(type(layer), name):
+                return layer
+            layer = layer.__dict__['venv']
+        return layer
+
+    def __setattr__(self, name, value):
+        if name == 'venv' or name not in self.__dict__:
+            VecEnvWrapper._chain_epoch += 1
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        VecEnvWrapper._chain_epoch += 1
+        object.__delattr__(self, name)
+
     def __getattr__(self, name):
         if name.startswith('_'):
             raise AttributeError("attempted to get missing private attribute '{}'".format(name))
-        return getattr(self.venv, name)
+        if 'venv' not in self.__dict__:
+            raise AttributeError("attempted to get attribute '{}' before setting venv".format(name))
+        # the cache is written into __dict__ directly, not to bump the epoch.
+        forward = self.__dict__.get('_forward')
+        if forward is None or forward[0] != VecEnvWrapper._chain_epoch:
+            forward = self.__dict__['_forward'] = (VecEnvWrapper._chain_epoch, {})
+        owner = forward[1].get(name)
+        if owner is None:
+            owner = self._owner(name)
+            value = getattr(owner, name)
+            forward[1][name] = owner
+            return value
+        return getattr(owner, name)
 
 
 class VecEnvObservationWrapper(VecEnvWrapper):
@@ -206,3 +352,53 @@ def clear_mpi_env_vars():
         yield
     finally:
         os.environ.update(removed_environment)
+
+
+if __name__ == "__main__":
+    import timeit
+
+    class _Env(VecEnv):
+        def __init__(self):
+            super().__init__(num_envs=64, observation_space=None, action_space=None)
+            self.custom = 0
+
+        def reset(self):
+            pass
+
+        def step_async(self, actions):
+            pass
+
+        def step_wait(self):
+            pass
+
+    class _Wrapper(VecEnvWrapper):
+        def reset(self):
+            return self.venv.reset()
+
+        def step_wait(self):
+            return self.venv.step_wait()
+
+    class _LegacyWrapper(_Wrapper):
+        # the former forwarding, walking the whole chain at each lookup.
+        __setattr__ = object.__setattr__
+
+        def __getattr__(self, name):
+            if name.startswith('_'):
+                raise AttributeError(name)
+            return getattr(self.venv, name)
+
+    def stack(cls, depth=10):
+        venv = _Env()
+        for _ in range(depth):
+            venv = cls(venv)
+        return venv
+
+    n = 200000
+    legacy, cached = stack(_LegacyWrapper), stack(_Wrapper)
+    compiled = stack(_Wrapper).compile()
+    print(f"{'10 wrappers':>24} | {'legacy':>8} | {'cached':>8} | {'compiled':>8}")
+    for name, statement in [("custom attribute", "venv.custom"),
+                            ("step_async", "venv.step_async(None)")]:
+        times = [timeit.timeit(statement, globals={'venv': venv}, number=n) / n * 1e9
+                 for venv in [legacy, cached, compiled]]
+        print(f"{name:>24} | {times[0]:>6.0f}ns | {times[1]:>6.0f}ns | {times[2]:>6.0f}ns")
@@ -0,0 +1,114 @@
+import gym
+import numpy as np
+from gym import spaces
+
+from misK.rl.procgen.wrappers.base import VecEnv
+
+
+class RandomEnv(gym.Env):
+    """
+    A cheap procgen look-alike, producing random frames. Used to benchmark the vectorized environments and the
+    wrappers without needing procgen itself.
+    """
+
+    def __init__(self, shape=(64, 64, 3), n_actions=15, episode_length=500, seed=None):
+        """
+            Constructs a RandomEnv instance.
+
+            Args
+            ----
+            shape : tuple of ints, optional
+                the shape of the frames. Defaults to the (64, 64, 3) procgen frames.
+            n_actions : int, optional
+                the size of the discrete action space. Defaults to the 15 procgen actions.
+            episode_length : int, optional
+                the number of steps of each episode.
+            seed : int, optional
+                the seed of the frame generator.
+
+            Returns
+            -------
+            self : RandomEnv
+                the constructed RandomEnv object instance.
+        """
+        self.observation_space = spaces.Box(low=0, high=255, shape=shape, dtype=np.uint8)
+        self.action_space = spaces.Discrete(n_actions)
+        self.episode_length = episode_length
+        self.rng = np.random.default_rng(seed)
+        self.current_step = 0
+
+    def _frame(self):
+        return self.rng.integers(0, 256, size=self.observation_space.shape, dtype=np.uint8)
+
+    def reset(self):
+        self.current_step = 0
+        return self._frame()
+
+    def step(self, action):
+        self.current_step += 1
+        done = self.current_step >= self.episode_length
+        return self._frame(), float(action == 0), done, {}
+
+    def render(self, mode='rgb_array'):
+        return self._frame()
+
+    def close(self):
+        pass
+
+
+class RandomVecEnv(VecEnv):
+    """
+    A vectorized counterpart of RandomEnv, cycling through a pool of pregenerated frames so that stepping it does
+    not allocate anything. Used to measure the cost of the wrappers alone.
+    """
+
+    def __init__(self, num_envs, shape=(64, 64, 3), n_actions=15, key=None, pool=8, seed=None):
+        """
+            Constructs a RandomVecEnv instance.
+
+            Args
+            ----
+            num_envs : int
+                the number of environments.
+            shape : tuple of ints, optional
+                the shape of the frames. Defaults to the (64, 64, 3) procgen frames.
+            n_actions : int, optional
+                the size of the discrete action space. Defaults to the 15 procgen actions.
+            key : str, optional
+                if given, the observations are Dict observations with the frames under that key, e.g. 'rgb' as
+                procgen does.
+            pool : int, optional
+                the number of pregenerated batches of frames.
+            seed : int, optional
+                the seed of the frame generator.
+
+            Returns
+            -------
+            self : RandomVecEnv
+                the constructed RandomVecEnv object instance.
+        """
+        observation_space = spaces.Box(low=0, high=255, shape=shape, dtype=np.uint8)
+        if key is not None:
+            observation_space = spaces.Dict({key: observation_space})
+        super().__init__(num_envs, observation_space, spaces.Discrete(n_actions))
+        self.key = key
+        self.frames = np.random.default_rng(seed).integers(0, 256, size=(pool, num_envs) + shape, dtype=np.uint8)
+        self.rews = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+        self.infos = [{} for _ in range(num_envs)]
+        self.current_step = 0
+
+    def _obs(self):
+        frames = self.frames[self.current_step % len(self.frames)]
+        return frames if self.key is None else {self.key: frames}
+
+    def reset(self):
+        self.current_step = 0
+        return self._obs()
+
+    def step_async(self, actions):
+        pass
+
+    def step_wait(self):
+        self.current_step += 1
+        return self._obs(), self.rews, self.dones, self.infos
@@ -22,7 +22,7 @@ class TrackAgent(VecEnvWrapper):
         super().__init__(venv=venv)
         self.agent = None
 
-    def step_async(self, actions):
+    def step_async(self, actions, env_ids=None):
         """
             Wrapper for the step_async method.
 
@@ -30,12 +30,14 @@ class TrackAgent(VecEnvWrapper):
             ----
             actions : list of ints
                 the actions taken in the vectorized environment.
+            env_ids : array of ints, optional
+                the environments to step, see VecEnvWrapper.step_async.
 
             Returns
             -------
             None
         """
-        self.venv.step_async(actions)
+        super().step_async(actions, env_ids)
 
     def step_wait(self):
         """
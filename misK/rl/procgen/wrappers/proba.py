@@ -17,17 +17,108 @@ def update_mean_var_count_from_moments(mean, var, count, batch_mean, batch_var,
 
 class RunningMeanStd(object):
     # https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Parallel_algorithm
-    def __init__(self, epsilon=1e-4, shape=()):
-        self.mean = np.zeros(shape, 'float64')
-        self.var = np.ones(shape, 'float64')
+
+    CHUNK = 1 << 18  # the maximum number of elements of the centered temporary of update.
+
+    def __init__(self, epsilon=1e-4, shape=(), dtype='float64'):
+        """
+            Constructs a RunningMeanStd instance, tracking the mean and the variance of a stream of batches.
+
+            Args
+            ----
+            epsilon : float, optional
+                the initial count, to avoid dividing by zero.
+            shape : tuple of ints, optional
+                the shape of a single sample.
+            dtype : str or numpy.dtype, optional
+                the type of the statistics and of the batch reductions. Defaults to 'float64'.
+
+            Returns
+            -------
+            self : RunningMeanStd
+                the constructed RunningMeanStd object instance.
+        """
+        self.dtype = np.dtype(dtype)
+        self.mean = np.zeros(shape, self.dtype)
+        self.var = np.ones(shape, self.dtype)
         self.count = epsilon
+        self._centered = None  # the centered chunk, reused from one update to the next.
 
     def update(self, x):
-        batch_mean = np.mean(x, axis=0)
-        batch_var = np.var(x, axis=0)
-        batch_count = x.shape[0]
-        self.update_from_moments(batch_mean, batch_var, batch_count)
+        # the batch is reduced chunk by chunk, the moments of the chunks being merged with the parallel formula, so
+        # that the centered temporary only holds a chunk, small enough to stay in cache, instead of the whole batch.
+        x = np.asarray(x)
+        rows = max(1, self.CHUNK // max(int(np.prod(x.shape[1:])), 1))
+        batch_mean, batch_var, batch_count = None, None, 0
+        for start in range(0, x.shape[0], rows):
+            chunk = x[start:start + rows]
+            if self._centered is None or self._centered.shape[1:] != chunk.shape[1:] or \
+                    len(self._centered) < len(chunk):
+                self._centered = np.empty(chunk.shape, self.dtype)
+            centered = self._centered[:len(chunk)]
+            chunk_mean = np.mean(chunk, axis=0, dtype=self.dtype)
+            np.subtract(chunk, chunk_mean, out=centered)
+            np.square(centered, out=centered)
+            chunk_var = np.mean(centered, axis=0)
+            if batch_mean is None:
+                batch_mean, batch_var, batch_count = chunk_mean, chunk_var, chunk.shape[0]
+            else:
+                batch_mean, batch_var, batch_count = update_mean_var_count_from_moments(
+                    batch_mean, batch_var, batch_count, chunk_mean, chunk_var, chunk.shape[0])
+        if batch_count > 0:
+            self.update_from_moments(batch_mean, batch_var, batch_count)
 
     def update_from_moments(self, batch_mean, batch_var, batch_count):
         self.mean, self.var, self.count = update_mean_var_count_from_moments(
             self.mean, self.var, self.count, batch_mean, batch_var, batch_count)
+        self.mean = self.mean.astype(self.dtype, copy=False)
+        self.var = self.var.astype(self.dtype, copy=False)
+
+    def merge(self, other):
+        """
+            Merges the statistics of another RunningMeanStd, e.g. gathered by a parallel worker, into this one.
+
+            Args
+            ----
+            other : RunningMeanStd or dict
+                the statistics to merge, or their state_dict.
+
+            Returns
+            -------
+            self : RunningMeanStd
+                this instance, with the merged statistics.
+        """
+        if isinstance(other, dict):
+            mean, var, count = other['mean'], other['var'], other['count']
+        else:
+            mean, var, count = other.mean, other.var, other.count
+        self.update_from_moments(np.asarray(mean), np.asarray(var), count)
+        return self
+
+    def state_dict(self):
+        """
+            Gives the statistics, to be saved or sent to another process.
+
+            Returns
+            -------
+            state : dict
+                copies of the mean, the variance and the count.
+        """
+        return {'mean': self.mean.copy(), 'var': self.var.copy(), 'count': self.count}
+
+    def load_state_dict(self, state):
+        """
+            Loads the statistics given by state_dict, replacing the current ones.
+
+            Args
+            ----
+            state : dict
+                the mean, the variance and the count to load.
+
+            Returns
+            -------
+            None
+        """
+        self.mean = np.array(state['mean'], dtype=self.dtype)
+        self.var = np.array(state['var'], dtype=self.dtype)
+        self.count = state['count']
@@ -0,0 +1,172 @@
+import json
+import time
+import tracemalloc
+
+from misK.printing.dictionary import hpprint
+
+
+class StepProfiler:
+    """
+    Times the reset, step_async and step_wait methods of each layer of a stack of vectorized wrappers.
+    The methods are patched on the instances, so that the nested calls of a layer to the one below it are timed too:
+    the time of a call is split into the time spent in the layer itself and the time spent in the layers below.
+    """
+
+    METHODS = ['reset', 'step_async', 'step_wait']
+
+    def __init__(self, track_memory=False):
+        """
+            Constructs a StepProfiler instance.
+
+            Args
+            ----
+            track_memory : bool, optional
+                also measures, with tracemalloc, the peak number of bytes allocated during each call, layers below
+                included. Slows the stepping down noticeably.
+
+            Returns
+            -------
+            self : StepProfiler
+                the constructed StepProfiler object instance.
+        """
+        self.track_memory = track_memory
+        self.layers = []  # the names of the profiled layers, from the outermost one.
+        self.stats = {}  # the statistics of each (layer, method).
+        self.patched = []  # the patched (layer, method, original instance attribute or None).
+        # the calls in progress, as [start, time in the layers below, memory at start, peak so far, peak reached in the
+        # layers below].
+        self._stack = []
+        self._started_tracing = False
+
+    def attach(self, venv):
+        """
+            Patches the methods of all the layers of venv, down to the innermost environment.
+
+            Args
+            ----
+            venv : VecEnv or child
+                the outermost layer to profile.
+
+            Returns
+            -------
+            None
+        """
+        layer = venv
+        while layer is not None:
+            name = f"{len(self.layers)}:{layer.__class__.__name__}"
+            self.layers.append(name)
+            for method in self.METHODS:
+                if not hasattr(type(layer), method) and method not in layer.__dict__:
+                    continue
+                key = (name, method)
+                self.stats[key] = {'calls': 0, 'total': 0., 'self': 0., 'bytes': 0, 'self_bytes': 0}
+                self.patched.append((layer, method, layer.__dict__.get(method)))
+                setattr(layer, method, self._wrap(key, getattr(layer, method)))
+            # the layers are walked through their own attributes, not the ones forwarded from below.
+            layer = layer.__dict__.get('venv')
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def detach(self):
+        """
+            Restores the methods of the profiled layers.
+        """
+        for layer, method, original in reversed(self.patched):
+            if original is None:
+                del layer.__dict__[method]
+            else:
+                layer.__dict__[method] = original
+        self.patched = []
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _wrap(self, key, func):
+        def timed(*args, **kwargs):
+            self._enter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit(key)
+
+        return timed
+
+    def _enter(self):
+        call = [0., 0., 0, 0, 0]
+        if self.track_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][3] = max(self._stack[-1][3], peak)
+            tracemalloc.reset_peak()
+            call[2] = current
+        self._stack.append(call)
+        call[0] = time.perf_counter()
+
+    def _exit(self, key):
+        elapsed = time.perf_counter()
+        call = self._stack.pop()
+        elapsed -= call[0]
+        stats = self.stats[key]
+        stats['calls'] += 1
+        stats['total'] += elapsed
+        stats['self'] += elapsed - call[1]
+        if self._stack:
+            self._stack[-1][1] += elapsed
+        if self.track_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], call[3])
+            stats['bytes'] += peak - call[2]
+            # the bytes of the layer itself are the ones allocated above the peak of the layers below.
+            stats['self_bytes'] += peak - max(call[4], call[2])
+            if self._stack:
+                self._stack[-1][3] = max(self._stack[-1][3], peak)
+                self._stack[-1][4] = max(self._stack[-1][4], peak)
+
+    def reset_stats(self):
+        for stats in self.stats.values():
+            stats.update(calls=0, total=0., self=0., bytes=0, self_bytes=0)
+
+    def to_dict(self):
+        """
+            Gives the statistics of each layer, from the outermost one.
+
+            Returns
+            -------
+            stats : dict
+                for each layer, and each one of its methods, the number of calls, the total and self times in seconds,
+                and the peak bytes allocated, by the layer and the ones below ('bytes') and by the layer itself
+                ('self_bytes'), summed over the calls (0 if the memory is not tracked).
+        """
+        return {layer: {method: dict(self.stats[(layer, method)]) for method in self.METHODS
+                        if (layer, method) in self.stats}
+                for layer in self.layers}
+
+    def dump(self, path):
+        """
+            Dumps the statistics given by to_dict into a JSON file.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self, heading=''):
+        """
+            Prints, for each layer, the mean self and total times of its methods in microseconds, the share of the
+            stepping time spent in the layer itself and, if tracked, the mean peak bytes allocated by a step, by the layer
+        itself and by the layer and the ones below.
+        """
+        stats = self.to_dict()
+        step_total = sum(method.get('self', 0.) for layer in stats.values()
+                         for name, method in layer.items() if name != 'reset')
+        for layer, methods in stats.items():
+            row = {'layer': layer}
+            for name, method in methods.items():
+                calls = max(method['calls'], 1)
+                row[name] = f"{1e6 * method['self'] / calls:.1f}/{1e6 * method['total'] / calls:.1f}us"
+            step_self = sum(method['self'] for name, method in methods.items() if name != 'reset')
+            row['step %'] = f"{100 * step_self / step_total:.1f}" if step_total > 0 else '-'
+            if self.track_memory and 'step_wait' in methods:
+                step_wait = methods['step_wait']
+                calls = max(step_wait['calls'], 1)
+                row['bytes/step'] = f"{step_wait['self_bytes'] // calls}/{step_wait['bytes'] // calls}"
+            hpprint(row, heading=heading)
+            print()
@@ -1,26 +1,162 @@
+import copy
 import os
+import queue
+import threading
 import time
 from datetime import datetime
-import subprocess
 import json
 
-import cv2
 import numpy as np
-from PIL import (ImageFont,
-                 Image,
-                 ImageDraw)
-from matplotlib import pyplot as plt
-from numpy import cos, sin
-from scipy import ndimage
-from tqdm.auto import trange
-
-from gym3 import ViewerWrapper as gym3_ViewerWrapper
 
 from misK.rl.procgen.wrappers.base import VecEnvWrapper
 
+# cv2, matplotlib and gym3 are only imported by the backends and methods using them, so that the workers importing
+# this module without recording do not pay for them.
+
+
+def _to_bgr(frame):
+    """
+        Converts a (C, H, W) RGB frame, in [0, 255] or in [0, 1] if of a float type, into the (H, W, C) uint8 BGR frame
+        expected by cv2.
+    """
+    frame = np.asarray(frame)
+    if np.issubdtype(frame.dtype, np.floating):
+        frame = (frame * 255).clip(0, 255)
+    return np.ascontiguousarray(np.transpose(frame, (1, 2, 0))[..., ::-1], dtype=np.uint8)
+
+
+class _Columns:
+    """
+    The columnar metadata of a sequence of frames, i.e. one array per field instead of one file per frame.
+    """
+
+    def __init__(self):
+        self.columns = {"episode": [], "frame": [], "reward": [], "action": [], "done": []}
+        self.logits = []
+
+    def append(self, episode, frame, reward, action, done, metadata):
+        for key, value in zip(["episode", "frame", "reward", "action", "done"], [episode, frame, reward, action, done]):
+            self.columns[key].append(value)
+        logits = metadata.get("logits")
+        # copied, as the logits may be a view on a buffer the caller reuses.
+        self.logits.append(None if logits is None else np.array(logits, dtype=np.float32).ravel())
+
+    def __len__(self):
+        return len(self.columns["frame"])
+
+    def arrays(self):
+        """
+            Gives the columns as arrays, the missing logits being filled with nan.
+        """
+        arrays = {key: np.asarray(values) for key, values in self.columns.items()}
+        widths = [len(logits) for logits in self.logits if logits is not None]
+        if widths:
+            arrays["logits"] = np.full((len(self.logits), widths[0]), np.nan, dtype=np.float32)
+            for i, logits in enumerate(self.logits):
+                if logits is not None:
+                    arrays["logits"][i] = logits
+        return arrays
+
+
+class PNGBackend:
+    """
+    Writes each frame as a PNG image, with its metadata in a JSON '.meta' file and in the file name.
+    """
+
+    def __init__(self, directory, num_envs):
+        import cv2
+        self.cv2 = cv2
+        self.directory = directory
+
+    def write(self, venv, episode, frame_idx, frame, reward, action, done, metadata):
+        head = os.path.join(self.directory, f"{venv:06d}_{episode:06.0f}")
+        filename = head + f"_{frame_idx:06.0f}_{reward}_{action}_{done}"
+        self.cv2.imwrite(filename + ".png", _to_bgr(frame), [self.cv2.IMWRITE_PNG_COMPRESSION, 1])
+        with open(filename + ".meta", 'w') as f:
+            f.write(json.dumps(metadata, default=lambda value: value.tolist()))
+
+    def close(self):
+        pass
+
+
+class VideoBackend:
+    """
+    Streams each episode of each environment into its own video file, with its columnar metadata in a '.npz' file
+    of the same name.
+    """
+
+    def __init__(self, directory, num_envs, fps=30, fourcc="MJPG", extension=".avi"):
+        import cv2
+        self.cv2 = cv2
+        self.directory = directory
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.extension = extension
+        self.videos = [None] * num_envs
+        self.columns = [None] * num_envs
+        self.names = [None] * num_envs
+
+    def write(self, venv, episode, frame_idx, frame, reward, action, done, metadata):
+        frame = _to_bgr(frame)
+        if self.videos[venv] is None:
+            self.names[venv] = os.path.join(self.directory, f"{venv:06d}_{episode:06.0f}")
+            self.videos[venv] = self.cv2.VideoWriter(self.names[venv] + self.extension, self.fourcc, self.fps,
+                                                     (frame.shape[1], frame.shape[0]))
+            self.columns[venv] = _Columns()
+        self.videos[venv].write(frame)
+        self.columns[venv].append(episode, frame_idx, reward, action, done, metadata)
+        if done:
+            self._end(venv)
+
+    def _end(self, venv):
+        self.videos[venv].release()
+        np.savez(self.names[venv] + ".npz", **self.columns[venv].arrays())
+        self.videos[venv], self.columns[venv] = None, None
+
+    def close(self):
+        for venv, video in enumerate(self.videos):
+            if video is not None:
+                self._end(venv)
+
+
+class ChunkedBackend:
+    """
+    Appends the frames of each environment to chunks of chunk_size frames, saved as compressed '.npz' files holding
+    the frames next to their columnar metadata.
+    """
+
+    def __init__(self, directory, num_envs, chunk_size=256):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.frames = [[] for _ in range(num_envs)]
+        self.columns = [_Columns() for _ in range(num_envs)]
+        self.chunks = [0] * num_envs
+
+    def write(self, venv, episode, frame_idx, frame, reward, action, done, metadata):
+        self.frames[venv].append(np.array(frame, copy=True))  # the frame may be a view on a reused buffer.
+        self.columns[venv].append(episode, frame_idx, reward, action, done, metadata)
+        if len(self.frames[venv]) >= self.chunk_size:
+            self._flush(venv)
+
+    def _flush(self, venv):
+        if not self.frames[venv]:
+            return
+        filename = os.path.join(self.directory, f"{venv:06d}_{self.chunks[venv]:06d}.npz")
+        np.savez_compressed(filename, frames=np.stack(self.frames[venv]), **self.columns[venv].arrays())
+        self.frames[venv], self.columns[venv] = [], _Columns()
+        self.chunks[venv] += 1
+
+    def close(self):
+        for venv in range(len(self.frames)):
+            self._flush(venv)
+
+
+BACKENDS = {"png": PNGBackend, "video": VideoBackend, "chunks": ChunkedBackend}
+
 
 class Recorder(VecEnvWrapper):
-    def __init__(self, venv, directory, needs_render=0, log=print):
+    def __init__(self, venv, directory, needs_render=0, n_writers=0, queue_size=64, policy="block", backend="png",
+                 backend_kwargs=None, log=print):
         """
             Constructs a Recorder instance, to allow the recording of an agent in the environment.
 
@@ -34,6 +170,21 @@ class Recorder(VecEnvWrapper):
             needs_render : int, optional
                 tells if the wrapper needs to lively render the observations. it is indeed the time for each frame.
                 If less than or equal to 0, no rendering.
+            n_writers : int, optional
+                the number of background threads encoding and writing the frames. Each environment is always
+                handled by the same writer, so that its frames are written in order. If 0, the frames are written
+                by the stepping thread.
+            queue_size : int, optional
+                the maximum number of frames waiting in the queue of each writer.
+            policy : str, optional
+                what to do when the queue of a writer is full: 'block' waits for the writer to catch up, 'drop'
+                drops the frame.
+            backend : str, optional
+                the output format, among 'png' (one image and one '.meta' file per frame), 'video' (one video
+                file per episode of each environment) and 'chunks' (compressed '.npz' chunks of frames of each
+                environment). 'video' and 'chunks' store the metadata as columns next to the frames.
+            backend_kwargs : dict, optional
+                the extra arguments of the backend, e.g. fps for 'video' or chunk_size for 'chunks'.
             log : function, optional
                 the log function to print strings. Defaults to built-in print.
 
@@ -64,11 +215,28 @@ class Recorder(VecEnvWrapper):
             autocreation = True
         self.print(f"(recordings will be saved in {self.video_dir} (auto: {int(autocreation)}))")
 
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+        self.backend_name = backend
+        self.backend = BACKENDS[backend](self.video_dir, self.num_envs, **(backend_kwargs or {}))
+
         # some buffers to label the frames correctly.
-        self.actions = [np.zeros(shape=(self.num_envs,))]  # the last actions taken by the agent.
+        self.actions = np.zeros(shape=(self.num_envs,), dtype=object)  # the last action taken in each environment.
         self.frames = np.zeros(shape=(self.num_envs,))  # number of frames in each current environment in the vector.
         self.episodes = np.zeros(shape=(self.num_envs,))  # stashes the number of elapsed episodes in each environment.
         self.metadata = {}
+        self.env_metadata = [{} for _ in range(self.num_envs)]  # the metadata of the next frame of each environment.
+
+        # the background writers, each one of them with its own bounded queue of frames.
+        if policy not in ["block", "drop"]:
+            raise ValueError(f"unknown policy '{policy}', expected 'block' or 'drop'")
+        self.policy = policy
+        self.dropped = 0
+        self.error = None  # the first exception raised by a writer, raised again by the stepping thread.
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(n_writers)]
+        self.writers = [threading.Thread(target=self._writer, args=(jobs,), daemon=True) for jobs in self.queues]
+        for writer in self.writers:
+            writer.start()
 
     def reset(self):
         """
@@ -86,9 +254,9 @@ class Recorder(VecEnvWrapper):
         obs = self.venv.reset()
         return obs
 
-    def save_obs(self, obs, dones, rewards):
+    def save_obs(self, obs, dones, rewards, env_ids=None):
         """
-            Saves an observation onto the disk.
+            Saves an observation onto the disk, or hands it to the background writers.
 
             Args
             ----
@@ -98,32 +266,70 @@ class Recorder(VecEnvWrapper):
                 tells which one of the environments are done.
             rewards : array of floats
                 gives the current rewards of all the environments.
+            env_ids : array of ints, optional
+                the environments of the batch, see batch_ids. Defaults to all the environments.
 
             Returns
             -------
             None
         """
-        for venv, frame in enumerate(obs):
-            # compute the file name.
-            head = os.path.join(self.video_dir, f"{venv:06d}_{self.episodes[venv]:06.0f}")
-            filename = head + f"_{self.frames[venv]:06.0f}_{rewards[venv]}_{self.actions[venv]}_{dones[venv]}"
-            # save the frame.
-            plt.imsave(filename + ".png", np.transpose(frame, (1, 2, 0)))
-
-            # incrementally construct the metadata to save.
-            metadata = {}
-            for key in ["logits", "actions"]:
-                if key in self.metadata:
-                    metadata[key] = self.metadata[key][venv]
-            # save the metadata.
-            with open(filename + ".meta", 'w') as f:
-                f.write(json.dumps(metadata))
-        self.metadata = {}
+        if self.error is not None:
+            raise self.error
+
+        env_ids = np.arange(self.num_envs)[slice(None) if env_ids is None else env_ids]
+        self._take_meta(env_ids)  # the metadata pushed after step_async.
+        # a single copy of the whole batch, as the observation buffers are reused by the wrappers below.
+        frames = np.array(obs, copy=True) if self.writers else obs
+        for i, (venv, frame) in enumerate(zip(env_ids, frames)):
+            metadata, self.env_metadata[venv] = self.env_metadata[venv], {}
+            job = (int(venv), self.episodes[venv], self.frames[venv], frame, rewards[i], self.actions[venv],
+                   dones[i], metadata)
+            if not self.writers:
+                self.backend.write(*job)
+            elif self.policy == "block":
+                self.queues[venv % len(self.queues)].put(job)
+            else:
+                try:
+                    self.queues[venv % len(self.queues)].put_nowait(job)
+                except queue.Full:
+                    self.dropped += 1
+
+    def _writer(self, jobs):
+        """
+            The loop of a background writer, writing the frames of its queue until it gets None.
+            After a failed write, the exception is kept for the stepping thread and the queue is only drained, so that
+            the stepping thread never blocks on a full queue.
+        """
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self.backend.write(*job)
+            except Exception as e:
+                self.error = e
 
     def push_meta(self, metadata):
         self.metadata = metadata
 
-    def step_async(self, actions):
+    def _take_meta(self, env_ids):
+        """
+            Moves the metadata pushed for the batch of environments env_ids, i.e. the values of each key in the order
+            of the batch, to the metadata of the next frame of each environment.
+        """
+        for key in ["logits", "actions"]:
+            if key in self.metadata:
+                for venv, value in zip(env_ids, self.metadata[key]):
+                    # copied, as the writers serialize it after the caller has reused its buffers.
+                    if isinstance(value, np.ndarray):
+                        self.env_metadata[venv][key] = np.array(value, copy=True)
+                    else:
+                        self.env_metadata[venv][key] = copy.deepcopy(value)
+        self.metadata = {}
+
+    def step_async(self, actions, env_ids=None):
         """
             Wrapper for the step_async method.
             Also takes care of the actions taken for frame stamping.
@@ -132,13 +338,17 @@ class Recorder(VecEnvWrapper):
             ----
             actions : list of ints
                 the actions taken in the vectorized environment.
+            env_ids : array of ints, optional
+                the environments to step, see VecEnvWrapper.step_async. Defaults to the ones of batch_ids.
 
             Returns
             -------
             None
         """
-        self.actions = actions
-        self.venv.step_async(actions)
+        ids = np.arange(self.num_envs)[self.batch_ids if env_ids is None else env_ids]
+        self.actions[ids] = list(actions)
+        self._take_meta(ids)
+        super().step_async(actions, env_ids)
 
     def step_wait(self):
         """
@@ -161,9 +371,10 @@ class Recorder(VecEnvWrapper):
             self._render(time=self.needs_render)
 
         # save the frames + increment all the frames + reset the done environments + count the episodes.
-        self.save_obs(obs, dones, rewards)
-        self.frames = (self.frames + 1) * (1 - dones)
-        self.episodes += dones
+        ids = self.batch_ids
+        self.save_obs(obs, dones, rewards, env_ids=ids)
+        self.frames[ids] = (self.frames[ids] + 1) * (1 - np.asarray(dones))
+        self.episodes[ids] += dones
 
         return obs, rewards, dones, infos
 
@@ -180,6 +391,7 @@ class Recorder(VecEnvWrapper):
             -------
             None
         """
+        from matplotlib import pyplot as plt
         plt.imshow(np.transpose(self.current_frame, (1, 2, 0)))
         plt.pause(time / 1000)
         plt.cla()
@@ -198,32 +410,64 @@ class Recorder(VecEnvWrapper):
         """
         self.venv.close()
 
+        # wait for the background writers to flush their queues, unless they died.
+        for jobs, writer in zip(self.queues, self.writers):
+            while writer.is_alive():
+                try:
+                    jobs.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+        for writer in self.writers:
+            writer.join()
+        if self.dropped:
+            self.print(f"{self.dropped} frames dropped by the writers")
+        self.backend.close()
+        if self.error is not None:
+            raise self.error
+
         # print the final video directory size.
-        video_size = int(subprocess.check_output(['du', '-s', self.video_dir]).split()[0].decode('utf-8'))
+        video_size = sum(entry.stat().st_size for entry in os.scandir(self.video_dir)) // 1024
         self.print(f"{self.video_dir} -> final directory size: {video_size}K")
-        print(f"python src/plots/videos.py -i {self.video_dir} -fps 30 -o out/video.avi -m raw::meta -r 500")
+        if self.backend_name == "png":
+            print(f"python src/plots/videos.py -i {self.video_dir} -fps 30 -o out/video.avi -m raw::meta -r 500")
 
 
-class ViewerWrapper(gym3_ViewerWrapper):
-    def __init__(self, venv, info_key="rgb", log=print):
-        log(f"-> {self.__class__.__name__}")
-        super().__init__(env=venv, info_key=info_key)
-        self.observation_space = self.ob_space
-        self.action_space = self.ac_space
-        self.num_envs = self.num
-        self.venv = self.env
+def _viewer_wrapper():
+    """
+        Defines ViewerWrapper on top of gym3's one, on first access.
+    """
+    from gym3 import ViewerWrapper as gym3_ViewerWrapper
 
-    def step(self, actions):
-        return self.venv.step(actions)
+    class ViewerWrapper(gym3_ViewerWrapper):
+        def __init__(self, venv, info_key="rgb", log=print):
+            log(f"-> {self.__class__.__name__}")
+            super().__init__(env=venv, info_key=info_key)
+            self.observation_space = self.ob_space
+            self.action_space = self.ac_space
+            self.num_envs = self.num
+            self.venv = self.env
 
-    def step_wait(self):
-        return self.venv.step_wait()
+        def step(self, actions):
+            return self.venv.step(actions)
 
-    def reset(self):
-        return self.venv.reset()
+        def step_wait(self):
+            return self.venv.step_wait()
 
-    def close(self):
-        self.venv.close()
+        def reset(self):
+            return self.venv.reset()
+
+        def close(self):
+            self.venv.close()
+
+    return ViewerWrapper
+
+
+def __getattr__(name):
+    if name == "ViewerWrapper":
+        globals()[name] = _viewer_wrapper()
+        return globals()[name]
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
 
 def get_text_dimensions(text_string, font):
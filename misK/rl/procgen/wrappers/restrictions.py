@@ -1,3 +1,5 @@
+import numpy as np
+
 from misK.rl.procgen.wrappers.base import VecEnvWrapper
 
 
@@ -11,7 +13,7 @@ class LimitEpisode(VecEnvWrapper):
             venv : ToBaselinesVecEnv or child
                 the vectorized environment that needs some recording.
             max_steps : int
-                the maximum number of steps allowed per episode before force quit.
+                the maximum number of steps allowed per episode of each environment before force quit.
             log : function, optional
                 the log function to print strings. Defaults to built-in print.
 
@@ -23,34 +25,42 @@ class LimitEpisode(VecEnvWrapper):
         log(f"-> {self.__class__.__name__}")
         super().__init__(venv=venv)
         self.max_steps = max_steps
-        self.current_step = 0
+        self.current_step = np.zeros(self.num_envs, dtype=np.int64)  # the current episode step of each environment.
 
     def step_wait(self):
         """
             Wrapper for the step_wait method.
-            Also increments the current episode step and check it against the maximum steps per episode.
+            Also increments the current episode step of each environment of the batch, see batch_ids, and check it
+            against the maximum steps per episode. The environments reaching it are marked as done, with
+            'TimeLimit.truncated' set in their info when they were not done already.
 
             Args
             ----
 
             Returns
             -------
-            (obs, rewards, dones, infos) : (Tensor, float or int, bool, dict or None)
+            (obs, rewards, dones, infos) : (Tensor, float or int, array of bool, dict or None)
                 gives the gym/procgen results for a step method.
         """
         obs, rewards, dones, infos = self.venv.step_wait()
 
-        self.current_step += 1
-        if self.current_step >= self.max_steps:
-            self.current_step = 0
-            dones = [True] * self.num_envs
+        ids = self.batch_ids
+        dones = np.asarray(dones, dtype=bool)
+        current_step = self.current_step[ids] + 1
+        truncated = current_step >= self.max_steps
+        if truncated.any():
+            for i in np.flatnonzero(truncated & ~dones):
+                infos[i]['TimeLimit.truncated'] = True
+            dones = dones | truncated
+        current_step[dones] = 0
+        self.current_step[ids] = current_step
 
         return obs, rewards, dones, infos
 
     def reset(self):
         """
             Wrapper for the reset method.
-            Also resets the current episode step.
+            Also resets the current episode steps.
 
             Args
             ----
@@ -60,5 +70,5 @@ class LimitEpisode(VecEnvWrapper):
             obs : (Tensor)
                 gives the gym/procgen first observation in the environment.
         """
-        self.current_step = 0
+        self.current_step[:] = 0
         return self.venv.reset()
@@ -0,0 +1,430 @@
+import multiprocessing as mp
+import os
+from collections import deque
+from multiprocessing import (connection,
+                             shared_memory)
+
+import numpy as np
+from gym import spaces
+
+from misK.rl.procgen.wrappers.base import (VecEnv,
+                                           CloudpickleWrapper,
+                                           clear_mpi_env_vars)
+from misK.rl.procgen.wrappers.errors import (AlreadySteppingError,
+                                             NotSteppingError)
+
+
+def obs_space_info(obs_space):
+    """
+        Gives the layout of an observation space, flattening Dict spaces into one entry per key.
+
+        Args
+        ----
+        obs_space : gym.spaces.Space
+            the observation space of a single environment.
+
+        Returns
+        -------
+        (keys, shapes, dtypes) : (list of str or None, dict, dict)
+            the keys of the observation (None for a non Dict space) with the shape and the dtype of each one of them.
+    """
+    if isinstance(obs_space, spaces.Dict):
+        subspaces = obs_space.spaces
+    else:
+        subspaces = {None: obs_space}
+    keys, shapes, dtypes = [], {}, {}
+    for key, box in subspaces.items():
+        keys.append(key)
+        shapes[key] = box.shape
+        dtypes[key] = box.dtype
+    return keys, shapes, dtypes
+
+
+def worker(remote, parent_remote, env_fns_wrapper, shm_names, shapes, dtypes, start, initializer=None, initargs=()):
+    """
+        The loop run by each worker process, to step a shard of copies of the environment.
+
+        Args
+        ----
+        remote : multiprocessing.Connection
+            the worker side of the pipe to the main process.
+        parent_remote : multiprocessing.Connection
+            the main process side of the pipe, closed right away in the worker.
+        env_fns_wrapper : CloudpickleWrapper
+            the wrapped list of functions building the environments of the shard.
+        shm_names : dict of str
+            the names of the shared memory blocks holding the observations, one per observation key.
+        shapes : dict of tuples
+            the full shapes of the shared observation buffers, environment axis included.
+        dtypes : dict of numpy.dtype
+            the types of the shared observation buffers.
+        start : int
+            the slot of the first environment of the shard inside the shared buffers.
+        initializer : CloudpickleWrapper, optional
+            the wrapped function called with initargs before building the environments.
+        initargs : tuple, optional
+            the arguments of the initializer.
+
+        Returns
+        -------
+        None
+    """
+    parent_remote.close()
+    if initializer is not None:
+        initializer.x(*initargs)
+    shms = {key: shared_memory.SharedMemory(name=name) for key, name in shm_names.items()}
+    envs = [env_fn() for env_fn in env_fns_wrapper.x]
+    stop = start + len(envs)
+    # the views on the slots of the shard only, so that the tight loops below index them from 0.
+    buffers = {key: np.ndarray(shapes[key], dtype=dtypes[key], buffer=shm.buf)[start:stop]
+               for key, shm in shms.items()}
+    items = list(buffers.items())
+    rews = np.zeros(len(envs), dtype=np.float32)
+    dones = np.zeros(len(envs), dtype=bool)
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'step':
+                ids, actions = data
+                ids = range(len(envs)) if ids is None else ids
+                infos = []
+                for j, (i, action) in enumerate(zip(ids, actions)):
+                    obs, rews[j], dones[j], info = envs[i].step(action)
+                    if dones[j]:
+                        obs = envs[i].reset()
+                    for key, buffer in items:
+                        buffer[i] = obs if key is None else obs[key]
+                    infos.append(info)
+                remote.send((rews[:len(infos)], dones[:len(infos)], infos))
+            elif cmd == 'reset':
+                for i, env in enumerate(envs):
+                    obs = env.reset()
+                    for key, buffer in items:
+                        buffer[i] = obs if key is None else obs[key]
+                remote.send(None)
+            elif cmd == 'render':
+                remote.send([env.render(mode='rgb_array') for env in envs])
+            elif cmd == 'close':
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(f"unknown command '{cmd}'")
+    except KeyboardInterrupt:
+        print("SubprocVecEnv worker: got KeyboardInterrupt")
+    finally:
+        for env in envs:
+            env.close()
+        # drop the numpy views before releasing the memory they point to.
+        del buffers, items
+        for shm in shms.values():
+            shm.close()
+
+
+class SubprocVecEnv(VecEnv):
+    """
+    A VecEnv that runs the copies of the environment in worker processes, each one of them stepping a shard of
+    several environments in a tight loop.
+    The observations are written by the workers into shared memory, so that the main process only has to read
+    a numpy view of them instead of unpickling the frames at each step.
+    """
+
+    def __init__(self, env_fns, n_workers=None, wait_num=None, context='spawn', initializer=None, initargs=()):
+        """
+            Constructs a SubprocVecEnv instance, with the environments packed into n_workers worker processes.
+
+            Args
+            ----
+            env_fns : list of callables
+                the functions building each copy of the environment. They are serialized with cloudpickle.
+            n_workers : int, optional
+                the number of worker processes, the environments being split into contiguous shards of (almost)
+                equal sizes. Defaults to the number of CPUs, capped by the number of environments.
+            wait_num : int, optional
+                the minimum number of environments step_wait waits for. When less than the number of environments,
+                the vectorized environment runs asynchronously: step_wait returns as soon as that many
+                environments are done stepping, their ids being given by the 'env_id' of their infos and by
+                last_env_ids, and step_async only steps the given env_ids, by default the ones last_env_ids gives.
+                Defaults to all the environments, i.e. a synchronous stepping.
+            context : str, optional
+                the multiprocessing start method. Defaults to 'spawn'.
+            initializer : callable, optional
+                a function called by each worker with initargs before building its environments, e.g.
+                misK.printing.logger.connect to send the logs of the environments to a LogSink.
+            initargs : tuple, optional
+                the arguments of the initializer. Unlike env_fns, they are given to the worker processes when they
+                start, so that they may hold multiprocessing objects, e.g. the queue of a LogSink or a ManagedBar.
+
+            Returns
+            -------
+            self : SubprocVecEnv
+                the constructed SubprocVecEnv object instance.
+        """
+        self.closed = False
+        # the resources of the workers, released by close, or right away if any of them fails to be allocated.
+        self.shms, self.ps, self.remotes, self.work_remotes = {}, [], (), ()
+        num_envs = len(env_fns)
+        n_workers = min(n_workers or os.cpu_count() or 1, num_envs)
+        self.wait_num = min(wait_num or num_envs, num_envs)
+        self.async_mode = self.wait_num < num_envs
+
+        # the spaces are read from a throw-away copy, as the shared buffers must exist before the workers start.
+        dummy = env_fns[0]()
+        observation_space, action_space = dummy.observation_space, dummy.action_space
+        dummy.close()
+        del dummy
+        VecEnv.__init__(self, num_envs, observation_space, action_space)
+
+        self.obs_keys, obs_shapes, obs_dtypes = obs_space_info(observation_space)
+        self.shapes = {key: (num_envs,) + tuple(obs_shapes[key]) for key in self.obs_keys}
+        self.dtypes = {key: np.dtype(obs_dtypes[key]) for key in self.obs_keys}
+
+        # the contiguous shards of environments, as (start, stop) slots in the shared buffers.
+        bounds = np.linspace(0, num_envs, n_workers + 1).round().astype(int)
+        self.shards = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        self.env_worker = np.repeat(np.arange(n_workers), np.diff(bounds))  # the worker of each environment.
+        self.env_ids = np.arange(num_envs)
+        self.last_env_ids = self.env_ids  # the environments whose results the last reset or step_wait returned.
+        self.rews = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+        self.infos = np.empty(num_envs, dtype=object)
+
+        # the state of the asynchronous stepping: the stepping environments and, for each worker, the ids of the
+        # environments of each message still to be received, in order.
+        self.pending = np.zeros(num_envs, dtype=bool)
+        self.outstanding = [deque() for _ in range(n_workers)]
+
+        try:
+            for key in self.obs_keys:
+                self.shms[key] = shared_memory.SharedMemory(create=True,
+                                                            size=max(1, int(np.prod(self.shapes[key])) *
+                                                                     self.dtypes[key].itemsize))
+            self.obs_bufs = {key: np.ndarray(self.shapes[key], dtype=self.dtypes[key], buffer=self.shms[key].buf)
+                             for key in self.obs_keys}
+            shm_names = {key: shm.name for key, shm in self.shms.items()}
+
+            ctx = mp.get_context(context)
+            self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_workers)])
+            initializer = None if initializer is None else CloudpickleWrapper(initializer)
+            self.ps = [ctx.Process(target=worker,
+                                   args=(work_remote, remote, CloudpickleWrapper(env_fns[shard]), shm_names,
+                                         self.shapes, self.dtypes, shard.start, initializer, tuple(initargs)))
+                       for work_remote, remote, shard in zip(self.work_remotes, self.remotes, self.shards)]
+            for p in self.ps:
+                p.daemon = True  # if the main process crashes, we should not cause things to hang.
+                with clear_mpi_env_vars():
+                    p.start()
+        except BaseException:
+            self._release(terminate=True)
+            self.closed = True
+            raise
+        finally:
+            for remote in self.work_remotes:
+                remote.close()
+
+    @property
+    def n_workers(self):
+        return len(self.ps)
+
+    @property
+    def waiting(self):
+        return bool(self.pending.any())
+
+    def reset(self):
+        """
+            Resets all the environments, cancelling any pending step.
+
+            Returns
+            -------
+            obs : numpy.ndarray or dict of numpy.ndarray
+                a view on the shared observations. It is overwritten by the next call to reset or step_wait.
+        """
+        self._assert_not_closed()
+        self._drain()
+        for remote in self.remotes:
+            remote.send(('reset', None))
+        for remote in self.remotes:
+            remote.recv()
+        self.last_env_ids = self.env_ids
+        return self._decode_obs()
+
+    def step_async(self, actions, env_ids=None):
+        """
+            Tells the environments env_ids to start taking a step with the given actions.
+
+            Args
+            ----
+            actions : array of ints
+                the actions to take, one per environment in env_ids.
+            env_ids : array of ints, optional
+                the environments to step. Defaults to last_env_ids, i.e. the environments whose results the last
+                reset or step_wait returned: all of them in synchronous mode, the ready ones in asynchronous mode, so
+                that the actions computed from the last results can be given as they are.
+
+            Returns
+            -------
+            None
+
+            Throws
+            ------
+            (AlreadySteppingError) raised when one of the environments is already stepping.
+        """
+        self._assert_not_closed()
+        actions = np.asarray(actions)
+        env_ids = self.last_env_ids if env_ids is None else np.asarray(env_ids)
+        if len(env_ids) == self.num_envs:
+            if self.waiting:
+                raise AlreadySteppingError()
+            if env_ids is not self.env_ids:
+                actions = actions[np.argsort(env_ids)]  # the actions of the environments in their order.
+            for remote, outstanding, shard in zip(self.remotes, self.outstanding, self.shards):
+                remote.send(('step', (None, actions[shard])))
+                outstanding.append(self.env_ids[shard])
+            self.pending[:] = True
+            return
+
+        if self.pending[env_ids].any():
+            raise AlreadySteppingError()
+        workers = self.env_worker[env_ids]
+        for w in np.unique(workers):
+            mask = workers == w
+            ids = env_ids[mask]
+            self.remotes[w].send(('step', (ids - self.shards[w].start, actions[mask])))
+            self.outstanding[w].append(ids)
+        self.pending[env_ids] = True
+
+    def step_wait(self):
+        """
+            Waits for the stepping environments. In synchronous mode, waits for all of them, otherwise returns as
+            soon as at least wait_num of them are done.
+
+            Returns
+            -------
+            (obs, rewards, dones, infos) : (numpy.ndarray or dict, numpy.ndarray, numpy.ndarray, list of dict)
+                the results of the step, of all the environments in synchronous mode and of the ready ones only in
+                asynchronous mode, the 'env_id' of each info and last_env_ids telling which environments they are.
+                When all the environments were stepped, obs is a view on the shared observations, overwritten by the
+                next call to reset or step_wait.
+
+            Throws
+            ------
+            (NotSteppingError) raised when no environment is stepping.
+        """
+        self._assert_not_closed()
+        n_pending = int(self.pending.sum())
+        if n_pending == 0:
+            raise NotSteppingError()
+        wait_num = min(self.wait_num, n_pending)
+
+        ready = []
+        n_ready = 0
+        while n_ready < wait_num:
+            remotes = {remote: w for w, remote in enumerate(self.remotes) if self.outstanding[w]}
+            for remote in connection.wait(list(remotes)):
+                ids = self.outstanding[remotes[remote]].popleft()
+                self.rews[ids], self.dones[ids], infos = remote.recv()
+                for i, info in zip(ids, infos):
+                    info['env_id'] = int(i)
+                    self.infos[i] = info
+                ready.append(ids)
+                n_ready += len(ids)
+        env_ids = np.sort(np.concatenate(ready))
+        self.pending[env_ids] = False
+
+        if len(env_ids) == self.num_envs:
+            self.last_env_ids = self.env_ids
+            obs = self._decode_obs()
+            rews, dones, infos = self.rews.copy(), self.dones.copy(), list(self.infos)
+        else:
+            self.last_env_ids = env_ids
+            obs = self._decode_obs(env_ids)
+            rews, dones, infos = self.rews[env_ids], self.dones[env_ids], list(self.infos[env_ids])
+        return obs, rews, dones, infos
+
+    def get_images(self):
+        self._assert_not_closed()
+        if self.waiting:
+            raise AlreadySteppingError()
+        for remote in self.remotes:
+            remote.send(('render', None))
+        return [image for remote in self.remotes for image in remote.recv()]
+
+    def close_extras(self):
+        if self.ps:
+            self._drain()
+            for remote in self.remotes:
+                remote.send(('close', None))
+        self._release()
+
+    def _release(self, terminate=False):
+        """
+            Joins the started workers, terminating them first if asked, and closes and unlinks the shared memory.
+            Each resource is only released once, so that it is safe to call again, e.g. by __del__, or on an
+            instance whose construction failed midway.
+        """
+        for p in self.ps:
+            if p.pid is None:
+                continue  # never started.
+            if terminate:
+                p.terminate()
+            p.join()
+        for remote in self.remotes:
+            remote.close()
+        self.ps, self.remotes = [], ()
+        self.__dict__.pop('obs_bufs', None)  # the numpy views are dropped before the memory they point to.
+        for shm in self.shms.values():
+            shm.close()
+            shm.unlink()
+        self.shms = {}
+
+    def _drain(self):
+        """
+            Receives and drops the results of all the pending steps.
+        """
+        for remote, outstanding in zip(self.remotes, self.outstanding):
+            while outstanding:
+                outstanding.popleft()
+                remote.recv()
+        self.pending[:] = False
+
+    def _decode_obs(self, env_ids=None):
+        if env_ids is None:
+            bufs = self.obs_bufs
+        else:
+            bufs = {key: buf[env_ids] for key, buf in self.obs_bufs.items()}
+        if self.obs_keys == [None]:
+            return bufs[None]
+        return dict(bufs)
+
+    def _assert_not_closed(self):
+        assert not self.closed, "Trying to operate on a SubprocVecEnv after calling close()"
+
+    def __del__(self):
+        if not self.closed:
+            self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import functools
+    import time
+
+    from misK.rl.procgen.wrappers.dummy import RandomEnv
+
+    parser = argparse.ArgumentParser(description="SubprocVecEnv throughput against the shard size.")
+    parser.add_argument("--num-envs", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--shard-sizes", type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    print(f"{'shard size':>10} | {'workers':>7} | {'steps/s':>10}")
+    for shard_size in args.shard_sizes:
+        venv = SubprocVecEnv([functools.partial(RandomEnv, seed=i) for i in range(args.num_envs)],
+                             n_workers=max(1, args.num_envs // shard_size))
+        actions = np.zeros(args.num_envs, dtype=np.int64)
+        venv.reset()
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            venv.step(actions)
+        elapsed = time.perf_counter() - start
+        print(f"{shard_size:>10} | {venv.n_workers:>7} | {args.num_envs * args.steps / elapsed:>10.0f}")
+        venv.close()
@@ -0,0 +1,241 @@
+import json
+import os
+
+import numpy as np
+
+from misK.rl.procgen.wrappers.base import VecEnvWrapper
+
+# one record per episode: the environment and the [start, stop) range of steps it spans in the step-major files.
+EPISODE_DTYPE = np.dtype([("env", np.int32), ("start", np.int64), ("stop", np.int64), ("complete", np.bool_)])
+
+
+class TrajectoryStore(VecEnvWrapper):
+    """
+    A vectorized wrapper recording the trajectories of all the environments into append-only binary files.
+    Each field (observations, actions, rewards, dones and logits) has its own file of step-major rows, i.e. of
+    shape (steps, num_envs, *field_shape), and an index lists the episodes as ranges of steps of an environment. An
+    episode is thus a strided slice of a memory-mapped file, see TrajectoryReader.
+    The row of step t holds the observation the agent acted upon, the action taken, the logits pushed with
+    push_meta, and the resulting reward and done.
+    As each row holds a step of all the environments, the environments must be stepped together: a batch of only
+    some of them, e.g. of an asynchronous SubprocVecEnv, raises a ValueError.
+    """
+
+    def __init__(self, venv, directory, log=print):
+        """
+            Constructs a TrajectoryStore instance.
+
+            Args
+            ----
+            venv : VecEnv or child
+                the vectorized environment whose trajectories are recorded.
+            directory : str
+                the directory of the store, created if needed. An existing store is appended to.
+            log : function, optional
+                the log function to print strings. Defaults to built-in print.
+
+            Returns
+            -------
+            self : TrajectoryStore
+                the constructed TrajectoryStore object instance.
+        """
+        log(f"-> {self.__class__.__name__}")
+        super().__init__(venv=venv)
+        if getattr(venv, 'wait_num', self.num_envs) < self.num_envs:
+            raise ValueError(f"{self.__class__.__name__} only records steps of all the environments at once, got an "
+                             f"asynchronous environment waiting for {venv.wait_num} of them")
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.spec_path = os.path.join(self.directory, "store.json")
+        if os.path.exists(self.spec_path):
+            with open(self.spec_path, 'r') as f:
+                self.spec = json.load(f)
+            if self.spec["num_envs"] != self.num_envs:
+                raise ValueError(f"store {self.directory} has {self.spec['num_envs']} environments, "
+                                 f"got {self.num_envs}")
+        else:
+            self.spec = {"num_envs": self.num_envs, "steps": 0, "fields": {}}
+        self.files = {}
+        self.row = self._recover()  # the number of steps in the store.
+        self.index = open(os.path.join(self.directory, "episodes.bin"), 'ab')
+
+        self.starts = np.full(self.num_envs, self.row, dtype=np.int64)  # the first step of the current episodes.
+        self.last_obs = None
+        self.metadata = {}
+
+    def _recover(self):
+        """
+            Gives the number of steps whose rows all the fields hold, truncating the files written past it. The steps
+            of the spec are only saved by flush and close, so that the files of a process which exited without close
+            may hold more steps, or a step it was writing.
+        """
+        rows = []
+        for name, field in self.spec["fields"].items():
+            path = os.path.join(self.directory, name + ".bin")
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            rows.append(field["start"] + size // self._row_nbytes(field))
+        row = min(rows, default=self.spec["steps"])
+
+        for name, field in self.spec["fields"].items():
+            path = os.path.join(self.directory, name + ".bin")
+            nbytes = max(row - field["start"], 0) * self._row_nbytes(field)
+            if os.path.exists(path) and os.path.getsize(path) > nbytes:
+                os.truncate(path, nbytes)
+        path = os.path.join(self.directory, "episodes.bin")
+        if os.path.exists(path):
+            episodes = np.fromfile(path, dtype=EPISODE_DTYPE)  # without the record it may have been writing.
+            episodes = episodes[episodes["stop"] <= row]
+            if episodes.nbytes != os.path.getsize(path):
+                episodes.tofile(path)
+
+        if row != self.spec["steps"]:
+            self.spec["steps"] = row
+            self._save_spec()
+        return row
+
+    def _row_nbytes(self, field):
+        return max(np.dtype(field["dtype"]).itemsize * self.num_envs * int(np.prod(field["shape"])), 1)
+
+    def _write(self, name, values):
+        """
+            Appends a row of num_envs values to the file of a field, declaring the field on its first row.
+        """
+        values = np.asarray(values)
+        if name not in self.spec["fields"]:
+            self.spec["fields"][name] = {"dtype": values.dtype.str, "shape": list(values.shape[1:]),
+                                         "start": self.row}
+            self._save_spec()
+        if name not in self.files:
+            self.files[name] = open(os.path.join(self.directory, name + ".bin"), 'ab')
+        field = self.spec["fields"][name]
+        np.ascontiguousarray(values, dtype=np.dtype(field["dtype"])).tofile(self.files[name])
+
+    def _save_spec(self):
+        with open(self.spec_path, 'w') as f:
+            json.dump(self.spec, f)
+
+    def _end_episodes(self, envs, stop, complete):
+        records = np.zeros(len(envs), dtype=EPISODE_DTYPE)
+        records["env"], records["start"], records["stop"], records["complete"] = envs, self.starts[envs], stop, complete
+        records = records[records["stop"] > records["start"]]
+        records.tofile(self.index)
+        self.starts[envs] = stop
+
+    def push_meta(self, metadata):
+        self.metadata = metadata
+        if hasattr(self.venv, "push_meta"):
+            self.venv.push_meta(metadata)
+
+    def reset(self):
+        obs = self.venv.reset()
+        # the episodes in progress are cut by the reset.
+        self._end_episodes(np.arange(self.num_envs), self.row, complete=False)
+        self.last_obs = obs
+        return obs
+
+    def step_async(self, actions, env_ids=None):
+        if env_ids is not None or not isinstance(self.batch_ids, slice):
+            raise ValueError(f"{self.__class__.__name__} only records steps of all the environments at once, got a "
+                             f"step of only some of them")
+        # the observation is written before stepping, as it may be a view on a buffer the step overwrites.
+        if isinstance(self.last_obs, dict):
+            for key, obs in self.last_obs.items():
+                self._write(f"obs.{key}", obs)
+        else:
+            self._write("obs", self.last_obs)
+        self._write("actions", actions)
+        if "logits" in self.metadata:
+            self._write("logits", self.metadata["logits"])
+        elif "logits" in self.spec["fields"]:
+            field = self.spec["fields"]["logits"]
+            self._write("logits", np.full([self.num_envs] + field["shape"], np.nan, dtype=field["dtype"]))
+        self.metadata = {}
+        super().step_async(actions)
+
+    def step_wait(self):
+        obs, rewards, dones, infos = self.venv.step_wait()
+        self._write("rewards", rewards)
+        self._write("dones", np.asarray(dones, dtype=bool))
+        self.row += 1
+        self._end_episodes(np.flatnonzero(dones), self.row, complete=True)
+        self.last_obs = obs
+        return obs, rewards, dones, infos
+
+    def flush(self):
+        """
+            Flushes the files, so that a TrajectoryReader sees all the steps recorded so far.
+        """
+        for f in self.files.values():
+            f.flush()
+        self.index.flush()
+        self.spec["steps"] = self.row
+        self._save_spec()
+
+    def close(self):
+        self._end_episodes(np.arange(self.num_envs), self.row, complete=False)
+        self.flush()
+        for f in self.files.values():
+            f.close()
+        self.index.close()
+        return self.venv.close()
+
+
+class TrajectoryReader:
+    """
+    Gives a random access to the episodes of a TrajectoryStore, through memory-mapped views of its files.
+    """
+
+    def __init__(self, directory):
+        """
+            Constructs a TrajectoryReader instance.
+
+            Args
+            ----
+            directory : str
+                the directory of the store.
+
+            Returns
+            -------
+            self : TrajectoryReader
+                the constructed TrajectoryReader object instance.
+        """
+        self.directory = directory
+        with open(os.path.join(self.directory, "store.json"), 'r') as f:
+            self.spec = json.load(f)
+        self.num_envs = self.spec["num_envs"]
+        self.episodes = np.fromfile(os.path.join(self.directory, "episodes.bin"), dtype=EPISODE_DTYPE)
+
+        self.fields, self.offsets = {}, {}
+        for name, field in self.spec["fields"].items():
+            dtype = np.dtype(field["dtype"])
+            row_shape = (self.num_envs,) + tuple(field["shape"])
+            path = os.path.join(self.directory, name + ".bin")
+            rows = os.path.getsize(path) // (dtype.itemsize * int(np.prod(row_shape)))
+            if rows == 0:
+                self.fields[name] = np.zeros((0,) + row_shape, dtype=dtype)
+            else:
+                self.fields[name] = np.memmap(path, dtype=dtype, mode='r', shape=(rows,) + row_shape)
+            self.offsets[name] = field["start"]
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def episode(self, i):
+        """
+            Gives the i-th episode of the store.
+
+            Args
+            ----
+            i : int
+                the index of the episode, in the order they ended.
+
+            Returns
+            -------
+            episode : dict of numpy.ndarray
+                the views of each field over the steps of the episode. A field declared after the episode started
+                only covers its last steps.
+        """
+        env, start, stop = (int(self.episodes[i][key]) for key in ["env", "start", "stop"])
+        return {name: field[max(start - self.offsets[name], 0):max(stop - self.offsets[name], 0), env]
+                for name, field in self.fields.items()}
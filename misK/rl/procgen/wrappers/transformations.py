@@ -7,29 +7,123 @@ from misK.rl.procgen.wrappers.proba import RunningMeanStd
 
 
 class VecFrameStack(VecEnvWrapper):
-    def __init__(self, venv, nstack):
+    """
+    A vectorized wrapper that stacks the nstack last frames of each environment along the channels.
+    The frames are kept in a ring buffer, where each frame is written twice, at slots head and head + nstack, so that
+    the nstack most recent frames always are a contiguous window of the buffer. A step thus only writes the newest
+    frame, and the stacked observations are a view on that window, overwritten by the next call to reset or
+    step_wait.
+    Once a batch only holds some of the environments, e.g. with an asynchronous SubprocVecEnv, each environment gets
+    its own head until the next reset, and the stacked observations of a batch are gathered into a new array.
+    """
+
+    def __init__(self, venv, nstack, channels_first=False):
+        """
+            Constructs a VecFrameStack instance.
+
+            Args
+            ----
+            venv : VecEnv or child
+                the vectorized environment whose frames are stacked.
+            nstack : int
+                the number of frames to stack.
+            channels_first : bool, optional
+                gives the stacked frames as (nstack * C, H, W) instead of (H, W, nstack * C), e.g. for torch.
+
+            Returns
+            -------
+            self : VecFrameStack
+                the constructed VecFrameStack object instance.
+        """
         self.venv = venv
         self.nstack = nstack
+        self.channels_first = channels_first
         wos = venv.observation_space  # wrapped ob space
         low = np.repeat(wos.low, self.nstack, axis=-1)
         high = np.repeat(wos.high, self.nstack, axis=-1)
-        self.stackedobs = np.zeros((venv.num_envs,) + low.shape, low.dtype)
+        channels = wos.shape[-1]
+        if self.channels_first:
+            low, high = np.moveaxis(low, -1, 0), np.moveaxis(high, -1, 0)
+            buffer_shape = (venv.num_envs, 2 * self.nstack, channels) + wos.shape[:-1]
+        else:
+            buffer_shape = (venv.num_envs,) + wos.shape[:-1] + (2 * self.nstack, channels)
+        self.buffer = np.zeros(buffer_shape, low.dtype)
+        self.head = 0  # the slot of the newest frame.
+        self.heads = None  # the slot of the newest frame of each environment, once they are not stepped together.
         observation_space = spaces.Box(low=low, high=high, dtype=venv.observation_space.dtype)
         VecEnvWrapper.__init__(self, venv, observation_space=observation_space)
 
+    def _slots(self, ids, slots):
+        """
+            Indexes the given slots of the environments ids in the ring buffer, the slots being broadcast against ids.
+        """
+        if self.channels_first:
+            return ids, slots
+        return (ids,) + (slice(None),) * (self.buffer.ndim - 3) + (slots,)
+
+    def _push(self, obs, ids=slice(None)):
+        if self.heads is None and isinstance(ids, slice):
+            self.head = (self.head + 1) % self.nstack
+            if self.channels_first:
+                obs = np.moveaxis(obs, -1, 1)
+                self.buffer[:, self.head] = obs
+                self.buffer[:, self.head + self.nstack] = obs
+            else:
+                self.buffer[..., self.head, :] = obs
+                self.buffer[..., self.head + self.nstack, :] = obs
+            return
+
+        if self.heads is None:
+            self.heads = np.full(self.num_envs, self.head)
+        ids = np.arange(self.num_envs)[ids]
+        heads = self.heads[ids] = (self.heads[ids] + 1) % self.nstack
+        if self.channels_first:
+            obs = np.moveaxis(obs, -1, 1)
+        self.buffer[self._slots(ids, heads)] = obs
+        self.buffer[self._slots(ids, heads + self.nstack)] = obs
+
+    @property
+    def stackedobs(self):
+        """
+            The nstack last frames of each environment, oldest first, as a view on the ring buffer while the
+            environments are stepped together.
+        """
+        if self.heads is not None:
+            return self._gather(slice(None))
+        start, stop = self.head + 1, self.head + 1 + self.nstack
+        if self.channels_first:
+            window = self.buffer[:, start:stop]
+        else:
+            window = self.buffer[..., start:stop, :]
+        return window.reshape((self.num_envs,) + self.observation_space.shape)
+
+    def _gather(self, ids):
+        """
+            Gives a copy of the nstack last frames of the environments ids, oldest first.
+        """
+        ids = np.arange(self.num_envs)[ids]
+        slots = self.heads[ids, None] + 1 + np.arange(self.nstack)
+        window = self.buffer[self._slots(ids[:, None], slots)]
+        if not self.channels_first:
+            window = np.moveaxis(window, 1, -2)  # the frames, gathered first, back before the channels.
+        return window.reshape((len(ids),) + self.observation_space.shape)
+
     def step_wait(self):
         obs, rews, news, infos = self.venv.step_wait()
-        self.stackedobs = np.roll(self.stackedobs, shift=-1, axis=-1)
-        for (i, new) in enumerate(news):
-            if new:
-                self.stackedobs[i] = 0
-        self.stackedobs[..., -obs.shape[-1]:] = obs
-        return self.stackedobs, rews, news, infos
+        ids = self.batch_ids
+        news = np.asarray(news, dtype=bool)
+        if news.any():
+            self.buffer[np.arange(self.num_envs)[ids][news]] = 0
+        self._push(obs, ids)
+        if self.heads is None:
+            return self.stackedobs, rews, news, infos
+        return self._gather(ids), rews, news, infos
 
     def reset(self):
         obs = self.venv.reset()
-        self.stackedobs[...] = 0
-        self.stackedobs[..., -obs.shape[-1]:] = obs
+        self.buffer[...] = 0
+        self.heads = None
+        self._push(obs)
         return self.stackedobs
 
 
@@ -66,12 +160,14 @@ class VecNormalize(VecEnvWrapper):
         obs, rews, news, infos = self.venv.step_wait()
         for i in range(len(infos)):
             infos[i]['env_reward'] = rews[i]
-        self.ret = self.ret * self.gamma + rews
+        ids = self.batch_ids
+        ret = self.ret[ids] * self.gamma + rews
         obs = self._obfilt(obs)
         if self.ret_rms:
-            self.ret_rms.update(self.ret)
+            self.ret_rms.update(ret)
             rews = np.clip(rews / np.sqrt(self.ret_rms.var + self.epsilon), -self.cliprew, self.cliprew)
-        self.ret[news] = 0.
+        ret[np.asarray(news, dtype=bool)] = 0.
+        self.ret[ids] = ret
         return obs, rews, news, infos
 
     def _obfilt(self, obs):
@@ -87,42 +183,236 @@ class VecNormalize(VecEnvWrapper):
         obs = self.venv.reset()
         return self._obfilt(obs)
 
+    def state_dict(self):
+        """
+            Gives the normalization statistics, to be checkpointed or merged into another VecNormalize.
+
+            Returns
+            -------
+            state : dict
+                the state_dict of the observation and the return statistics, None when not normalized.
+        """
+        return {'ob_rms': self.ob_rms.state_dict() if self.ob_rms else None,
+                'ret_rms': self.ret_rms.state_dict() if self.ret_rms else None}
+
+    def load_state_dict(self, state):
+        """
+            Loads the normalization statistics given by state_dict.
+
+            Args
+            ----
+            state : dict
+                the state_dict of the observation and the return statistics.
+
+            Returns
+            -------
+            None
+        """
+        for name in ['ob_rms', 'ret_rms']:
+            if getattr(self, name) and state.get(name) is not None:
+                getattr(self, name).load_state_dict(state[name])
+
 
 class TransposeFrame(VecEnvWrapper):
-    def __init__(self, venv, log=print):
+    def __init__(self, venv, dtype=None, contiguous=False, log=print):
+        """
+            Constructs a TransposeFrame instance, moving the channels of the frames first.
+
+            Args
+            ----
+            venv : VecEnv or child
+                the vectorized environment whose frames are transposed.
+            dtype : numpy.dtype, optional
+                the type of the transposed frames. Defaults to the type of the frames of venv.
+            contiguous : bool, optional
+                copies the transposed frames into a preallocated contiguous buffer, reused at each step, instead of
+                returning a transposed view. Always the case when dtype differs from the type of the frames.
+            log : function, optional
+                the log function to print strings. Defaults to built-in print.
+
+            Returns
+            -------
+            self : TransposeFrame
+                the constructed TransposeFrame object instance.
+        """
         log(f"-> {self.__class__.__name__}")
         super().__init__(venv=venv)
         obs_shape = self.observation_space.shape
+        self.dtype = np.dtype(dtype or self.observation_space.dtype)
         self.observation_space = spaces.Box(low=0, high=255, shape=(obs_shape[2], obs_shape[0], obs_shape[1]),
-                                            dtype=np.float32)
+                                            dtype=self.dtype)
+        self.buffer = None
+        if contiguous or self.dtype != venv.observation_space.dtype:
+            self.buffer = np.zeros((self.num_envs,) + self.observation_space.shape, dtype=self.dtype)
+
+    def _transpose(self, obs):
+        obs = obs.transpose(0, 3, 1, 2)
+        if self.buffer is None:
+            return obs
+        buffer = self.buffer[:len(obs)]  # a batch may only hold some of the environments.
+        np.copyto(buffer, obs, casting='unsafe')
+        return buffer
 
     def step_wait(self):
         obs, rewards, dones, infos = self.venv.step_wait()
-        return obs.transpose(0, 3, 1, 2), rewards, dones, infos
+        return self._transpose(obs), rewards, dones, infos
 
     def reset(self):
         obs = self.venv.reset()
-        return obs.transpose(0, 3, 1, 2)
+        return self._transpose(obs)
 
 
 class ScaledFloatFrame(VecEnvWrapper):
-    def __init__(self, venv, log=print):
+    def __init__(self, venv, dtype=np.float32, log=print):
+        """
+            Constructs a ScaledFloatFrame instance, scaling the frames from [0, 255] to [0, 1].
+
+            Args
+            ----
+            venv : VecEnv or child
+                the vectorized environment whose frames are scaled.
+            dtype : numpy.dtype, optional
+                the type of the scaled frames, written into a preallocated buffer reused at each step. With an
+                integer type, e.g. numpy.uint8, the frames are left untouched, to be scaled later by the learner.
+                Defaults to numpy.float32.
+            log : function, optional
+                the log function to print strings. Defaults to built-in print.
+
+            Returns
+            -------
+            self : ScaledFloatFrame
+                the constructed ScaledFloatFrame object instance.
+        """
         log(f"-> {self.__class__.__name__}")
         super().__init__(venv=venv)
         obs_shape = self.observation_space.shape
-        self.observation_space = spaces.Box(low=0, high=1, shape=obs_shape, dtype=np.float32)
+        self.dtype = np.dtype(dtype)
+        self.buffer = None
+        if np.issubdtype(self.dtype, np.integer):
+            self.observation_space = spaces.Box(low=0, high=255, shape=obs_shape, dtype=self.dtype)
+        else:
+            self.observation_space = spaces.Box(low=0, high=1, shape=obs_shape, dtype=self.dtype)
+            self.scale = self.dtype.type(1 / 255.0)
+            self.buffer = np.zeros((self.num_envs,) + obs_shape, dtype=self.dtype)
+
+    def _scale(self, obs):
+        if self.buffer is None:
+            return obs.astype(self.dtype, copy=False)
+        buffer = self.buffer[:len(obs)]  # a batch may only hold some of the environments.
+        np.multiply(obs, self.scale, out=buffer, casting='unsafe')
+        return buffer
 
     def step_wait(self):
         obs, rewards, dones, infos = self.venv.step_wait()
-        return obs / 255.0, rewards, dones, infos
+        return self._scale(obs), rewards, dones, infos
 
     def reset(self):
         obs = self.venv.reset()
-        return obs / 255.0
+        return self._scale(obs)
+
+
+class ObsPipeline(VecEnvObservationWrapper):
+    """
+    A vectorized wrapper fusing the observation stages of VecExtractDictObs, TransposeFrame, ScaledFloatFrame and
+    VecNormalize. The stages are applied with in-place numpy operations into a preallocated float32 buffer, already
+    in the final layout, instead of allocating a new array at each stage. The returned observations are that
+    buffer, overwritten by the next call to reset or step_wait.
+    Only the observations are normalized: the returns can still be normalized with VecNormalize(ob=False).
+    """
+
+    def __init__(self, venv, key=None, transpose=True, scale=True, normalize=False, clipob=10., epsilon=1e-8,
+                 log=print):
+        """
+            Constructs an ObsPipeline instance.
+
+            Args
+            ----
+            venv : VecEnv or child
+                the vectorized environment whose observations are preprocessed.
+            key : str, optional
+                the key of the observation to extract from a Dict observation, e.g. 'rgb' for procgen. If None,
+                the observations are used as is.
+            transpose : bool, optional
+                moves the channels first, from (H, W, C) to (C, H, W).
+            scale : bool, optional
+                scales the observations from [0, 255] to [0, 1].
+            normalize : bool, optional
+                normalizes the observations with running statistics, and clips them into [-clipob, clipob].
+            clipob : float, optional
+                the clipping bound of the normalized observations.
+            epsilon : float, optional
+                the term added to the variance before normalizing.
+            log : function, optional
+                the log function to print strings. Defaults to built-in print.
+
+            Returns
+            -------
+            self : ObsPipeline
+                the constructed ObsPipeline object instance.
+        """
+        log(f"-> {self.__class__.__name__}")
+        self.key = key
+        self.transpose = transpose
+        self.scale = np.float32(1 / 255. if scale else 1.)
+        self.clipob = clipob
+        self.epsilon = epsilon
+
+        space = venv.observation_space if key is None else venv.observation_space.spaces[key]
+        shape = space.shape
+        if self.transpose:
+            shape = (shape[2], shape[0], shape[1])
+        if normalize:
+            low, high = -clipob, clipob
+        else:
+            low, high = 0, 1 if scale else 255
+        super().__init__(venv=venv, observation_space=spaces.Box(low=low, high=high, shape=shape, dtype=np.float32))
+
+        self.ob_rms = RunningMeanStd(shape=shape) if normalize else None
+        self.buffer = np.zeros((self.num_envs,) + shape, dtype=np.float32)
+        self.inv_std = np.ones(shape, dtype=np.float32)
+
+    def process(self, obs):
+        if self.key is not None:
+            obs = obs[self.key]
+        if self.transpose:
+            obs = obs.transpose(0, 3, 1, 2)  # only a view, the copy happens while scaling into the buffer.
+        buffer = self.buffer[:len(obs)]  # a batch may only hold some of the environments.
+        np.multiply(obs, self.scale, out=buffer, casting='unsafe')
+        if self.ob_rms:
+            self.ob_rms.update(buffer)
+            np.sqrt(self.ob_rms.var + self.epsilon, out=self.inv_std, casting='unsafe')
+            np.reciprocal(self.inv_std, out=self.inv_std)
+            np.subtract(buffer, self.ob_rms.mean, out=buffer, casting='unsafe')
+            np.multiply(buffer, self.inv_std, out=buffer)
+            np.clip(buffer, -self.clipob, self.clipob, out=buffer)
+        return buffer
 
 
 class SymmetricEnv(VecEnvWrapper):
-    def __init__(self, venv, expert=True, log=print):
+    def __init__(self, venv, expert=True, p_reverse=None, seed=None, log=print):
+        """
+            Constructs a SymmetricEnv instance, mirroring the frames of some of the environments horizontally.
+
+            Args
+            ----
+            venv : VecEnv or child
+                the vectorized environment to mirror.
+            expert : bool, optional
+                if False, the frames are also mirrored after each step and the left and right actions of the
+                mirrored environments are swapped.
+            p_reverse : float, optional
+                the probability for each environment to be mirrored, drawn again at the end of each of its
+                episodes. If None, all the environments are mirrored.
+            seed : int, optional
+                the seed of the draws of the mirrored environments.
+            log : function, optional
+                the log function to print strings. Defaults to built-in print.
+
+            Returns
+            -------
+            self : SymmetricEnv
+                the constructed SymmetricEnv object instance.
+        """
         log(f"-> {self.__class__.__name__}")
         super().__init__(venv=venv)
         obs_shape = self.observation_space.shape
@@ -130,15 +420,42 @@ class SymmetricEnv(VecEnvWrapper):
 
         self.reversed = None
         self.expert = expert
+        self.p_reverse = p_reverse
+        self.rng = np.random.default_rng(seed)
+        self.buffer = None
+
+        # [u'↙', u'←', u'↖', u'↓', u'⌀', u'↑', u'↘', u'→', u'↗', 'D', 'A', 'W', 'S', 'Q', 'E']
+        # (0, 1, 2) <-> (6, 7, 8) if reversed
+        self.action_map = np.arange(max(getattr(self.action_space, 'n', 15), 9))
+        self.action_map[[0, 1, 2, 6, 7, 8]] = [6, 7, 8, 0, 1, 2]
+
+    def _draw(self, envs):
+        if self.p_reverse is None:
+            self.reversed[envs] = True
+        else:
+            self.reversed[envs] = self.rng.random(np.count_nonzero(envs)) < self.p_reverse
+
+    def _flip(self, obs, ids=slice(None)):
+        """
+            Mirrors the frames of the reversed environments among ids into a preallocated buffer, reused at each step.
+        """
+        shape = (self.num_envs,) + obs.shape[1:]
+        if self.buffer is None or self.buffer.shape != shape or self.buffer.dtype != obs.dtype:
+            self.buffer = np.empty(shape, dtype=obs.dtype)
+        buffer = self.buffer[:len(obs)]  # a batch may only hold some of the environments.
+        # each frame is flipped along its second spatial axis, the one after the environment axis.
+        mask = self.reversed[ids].reshape((-1,) + (1,) * (obs.ndim - 1))
+        np.copyto(buffer, obs, where=~mask)
+        np.copyto(buffer, np.flip(obs, axis=3), where=mask)
+        return buffer
 
     def reset(self):
         obs = self.venv.reset()
-        # self.reversed = np.random.randint(2, size=self.num_envs)
-        self.reversed = np.ones(shape=self.num_envs)
-        obs = np.stack([np.flip(obs, axis=2) if self.reversed[i] else obs for i, obs in enumerate(obs)])
-        return obs
+        self.reversed = np.zeros(self.num_envs, dtype=bool)
+        self._draw(np.ones(self.num_envs, dtype=bool))
+        return self._flip(obs)
 
-    def step_async(self, actions):
+    def step_async(self, actions, env_ids=None):
         """
             Wrapper for the step_async method.
             Also takes care of the actions taken for frame stamping.
@@ -147,20 +464,66 @@ class SymmetricEnv(VecEnvWrapper):
             ----
             actions : list of ints
                 the actions taken in the vectorized environment.
+            env_ids : array of ints, optional
+                the environments to step, see VecEnvWrapper.step_async. Defaults to the ones of batch_ids.
 
             Returns
             -------
             None
         """
-        # [u'↙', u'←', u'↖', u'↓', u'⌀', u'↑', u'↘', u'→', u'↗', 'D', 'A', 'W', 'S', 'Q', 'E']
-        # (0, 1, 2) <-> (6, 7, 8) if reversed
         if not self.expert:
-            f = lambda action: action + 6 if action in [0, 1, 2] else action - 6 if action in [6, 7, 8] else action
-            actions = np.array(list(map(f, actions)))
-        self.venv.step_async(actions)
+            actions = np.asarray(actions)
+            reversed_ = self.reversed[self.batch_ids if env_ids is None else env_ids]
+            actions = np.where(reversed_, self.action_map[actions], actions)
+        super().step_async(actions, env_ids)
 
     def step_wait(self):
         obs, rewards, dones, infos = self.venv.step_wait()
         if not self.expert:
-            obs = np.stack([np.flip(obs, axis=2) if self.reversed[i] else obs for i, obs in enumerate(obs)])
+            ids = self.batch_ids
+            # the observation of a done environment is the first one of its next episode.
+            dones = np.asarray(dones, dtype=bool)
+            if self.p_reverse is not None and dones.any():
+                envs = np.zeros(self.num_envs, dtype=bool)
+                envs[ids] = dones
+                self._draw(envs)
+            obs = self._flip(obs, ids)
         return obs, rewards, dones, infos
+
+
+if __name__ == "__main__":
+    import tracemalloc
+
+    from misK.rl.procgen.wrappers.dummy import RandomVecEnv
+
+    def bytes_per_step(step, n_steps=20):
+        step()  # warm up the preallocated buffers.
+        tracemalloc.start()
+        total = 0
+        for _ in range(n_steps):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            step()
+            total += tracemalloc.get_traced_memory()[1] - current
+        tracemalloc.stop()
+        return total / n_steps
+
+    def legacy(venv):
+        # the former TransposeFrame + ScaledFloatFrame: a transposed view, then a float64 division.
+        def step():
+            obs, _, _, _ = venv.step_wait()
+            return obs.transpose(0, 3, 1, 2) / 255.0
+        return step
+
+    def wrapped(venv, **kwargs):
+        venv = ScaledFloatFrame(TransposeFrame(venv, **kwargs, log=lambda *args: None), log=lambda *args: None)
+        return venv.step_wait
+
+    num_envs = 256
+    print(f"{'pipeline':>36} | {'bytes/step':>12}")
+    for name, step in [("before: transpose + obs / 255.0", legacy(RandomVecEnv(num_envs))),
+                       ("after: float32 buffers", wrapped(RandomVecEnv(num_envs))),
+                       ("after: contiguous float32 buffers", wrapped(RandomVecEnv(num_envs), contiguous=True))]:
+        print(f"{name:>36} | {bytes_per_step(step):>12.0f}")
+    venv = ScaledFloatFrame(RandomVecEnv(num_envs), dtype=np.uint8, log=lambda *args: None)
+    print(f"{'after: uint8 kept for the learner':>36} | {bytes_per_step(venv.step_wait):>12.0f}")
@@ -0,0 +1,44 @@
+import numpy as np
+
+from misK.rl.procgen.wrappers.base import VecEnvWrapper
+from misK.rl.procgen.wrappers.dummy import RandomVecEnv
+
+
+class _Wrapper(VecEnvWrapper):
+    def reset(self):
+        return self.venv.reset()
+
+    def step_wait(self):
+        return self.venv.step_wait()
+
+
+def _stack(depth=4):
+    venv = RandomVecEnv(2, shape=(4, 4, 3))
+    for _ in range(depth):
+        venv = _Wrapper(venv)
+    return venv
+
+
+def _calls(profiler, method):
+    return [profiler.stats[(layer, method)]['calls'] for layer in profiler.layers]
+
+
+def test_profile_compiled_stack():
+    for compile_first in [True, False]:
+        venv = _stack()
+        if compile_first:
+            venv.compile()
+            profiler = venv.enable_profiling()
+        else:
+            profiler = venv.enable_profiling()
+            venv.compile()
+        venv.reset()
+        for _ in range(3):
+            venv.step(np.zeros(2, dtype=np.int64))
+        # each layer is timed, none of them being skipped by the compiled bindings.
+        assert _calls(profiler, 'step_async') == [3] * 5
+        assert _calls(profiler, 'step_wait') == [3] * 5
+
+        venv.disable_profiling()
+        # the stack is compiled again once the profiling stops.
+        assert venv.__dict__['step_async'].__self__ is venv.unwrapped
@@ -0,0 +1,51 @@
+import functools
+import json
+
+import numpy as np
+
+from misK.misc.progress import ProgressManager
+from misK.printing import logger
+from misK.printing.sink import LogSink
+from misK.rl.procgen.wrappers.dummy import RandomEnv
+from misK.rl.procgen.wrappers.subproc import SubprocVecEnv
+
+_BAR = []  # the ManagedBar given to the worker, see _init.
+
+
+class _LoggingEnv(RandomEnv):
+    def step(self, action):
+        logger.log(f"step of {self.name}", prt=False)
+        if _BAR:
+            _BAR[0]()
+        return super().step(action)
+
+
+def _env_fn(name):
+    env = _LoggingEnv(shape=(4, 4, 3))
+    env.name = name
+    return env
+
+
+def _init(queue, bar):
+    logger.connect(queue)
+    _BAR.append(bar)
+
+
+def test_log_from_spawn_workers(tmp_path):
+    filename = str(tmp_path / "log.jsonl")
+    sink = LogSink(filename, fmt="jsonl")
+    manager = ProgressManager(refresh=10)
+    bar = manager.add(total=4)
+    venv = SubprocVecEnv([functools.partial(_env_fn, f"env-{i}") for i in range(2)], n_workers=2,
+                         initializer=_init, initargs=(sink.queue, bar))
+    venv.reset()
+    for _ in range(2):
+        venv.step(np.zeros(2, dtype=np.int64))
+    venv.close()
+    sink.close()
+    manager.close()
+
+    with open(filename) as f:
+        records = [json.loads(line) for line in f]
+    assert sorted(record["msg"] for record in records) == ["step of env-0"] * 2 + ["step of env-1"] * 2
+    assert manager.counts[bar.index] == 4
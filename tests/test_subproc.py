@@ -0,0 +1,64 @@
+import functools
+
+import numpy as np
+
+from misK.rl.procgen.wrappers.dummy import RandomEnv
+from misK.rl.procgen.wrappers.restrictions import LimitEpisode
+from misK.rl.procgen.wrappers.subproc import SubprocVecEnv
+from misK.rl.procgen.wrappers.transformations import (ScaledFloatFrame,
+                                                      SymmetricEnv,
+                                                      VecFrameStack,
+                                                      VecNormalize)
+
+
+def _quiet(*args):
+    pass
+
+
+def _env_fns(num_envs, shape=(8, 8, 3), episode_length=1000):
+    return [functools.partial(RandomEnv, shape=shape, episode_length=episode_length, seed=i) for i in range(num_envs)]
+
+
+def test_wrapped_async_steps():
+    num_envs, max_steps = 6, 5
+    venv = SubprocVecEnv(_env_fns(num_envs), n_workers=3, wait_num=2)
+    venv = LimitEpisode(venv, max_steps=max_steps, log=_quiet)
+    venv = ScaledFloatFrame(venv, log=_quiet)
+    venv = VecFrameStack(venv, nstack=3)
+    venv = VecNormalize(venv, ob=False)
+    venv = SymmetricEnv(venv, expert=False, p_reverse=0.5, seed=0, log=_quiet)
+    try:
+        obs = venv.reset()
+        assert obs.shape == (num_envs, 8, 8, 9)
+        steps = np.zeros(num_envs, dtype=np.int64)
+        for _ in range(60):
+            obs, rews, dones, infos = venv.step(np.zeros(len(obs), dtype=np.int64))
+            ids = np.array([info['env_id'] for info in infos])
+            np.testing.assert_array_equal(ids, venv.unwrapped.last_env_ids)
+            assert 2 <= len(ids) == len(obs) == len(rews) == len(dones)
+            assert obs.shape[1:] == (8, 8, 9)
+            steps[ids] += 1
+            # the episodes are only ended by LimitEpisode.
+            assert (steps[ids] <= max_steps).all()
+            for i, done, info in zip(ids, dones, infos):
+                assert done == (steps[i] == max_steps)
+                assert info.get('TimeLimit.truncated', False) == done
+            steps[ids[dones]] = 0
+    finally:
+        venv.close()
+
+
+def test_async_default_env_ids():
+    venv = SubprocVecEnv(_env_fns(4), n_workers=4, wait_num=1)
+    try:
+        venv.reset()
+        venv.step_async(np.zeros(4, dtype=np.int64))
+        venv.step_wait()
+        # the default env_ids are the ready environments, the others still stepping.
+        for _ in range(10):
+            ready = venv.last_env_ids
+            venv.step_async(np.zeros(len(ready), dtype=np.int64))
+            assert venv.pending[ready].all()
+            venv.step_wait()
+    finally:
+        venv.close()
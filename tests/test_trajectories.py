@@ -0,0 +1,35 @@
+import numpy as np
+
+from misK.rl.procgen.wrappers.dummy import RandomVecEnv
+from misK.rl.procgen.wrappers.trajectories import (TrajectoryReader,
+                                                   TrajectoryStore)
+
+
+def _quiet(*args):
+    pass
+
+
+def _run(store, actions, done_at=None):
+    store.reset()
+    for t, action in enumerate(actions):
+        store.venv.dones[:] = t == done_at
+        store.step(np.full(store.num_envs, action))
+
+
+def test_reopen_without_close(tmp_path):
+    directory = str(tmp_path)
+    store = TrajectoryStore(RandomVecEnv(2, shape=(4, 4, 3)), directory, log=_quiet)
+    _run(store, [0, 1, 2, 3, 4])
+    for f in store.files.values():
+        f.flush()  # the process exits without close.
+    store.files["obs"].write(b'\0' * 7)  # the store was writing a step.
+
+    store = TrajectoryStore(RandomVecEnv(2, shape=(4, 4, 3)), directory, log=_quiet)
+    assert store.row == 5
+    _run(store, [100, 101, 102], done_at=2)
+    store.close()
+
+    reader = TrajectoryReader(directory)
+    episodes = [reader.episode(i) for i in range(len(reader))]
+    assert len(reader.fields["actions"]) == len(reader.fields["obs"]) == 8
+    np.testing.assert_array_equal(episodes[0]["actions"], [100, 101, 102])